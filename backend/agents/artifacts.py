@@ -0,0 +1,75 @@
+"""Content-addressed store for the large strings a run produces.
+
+Generated code, execution logs, reports and tracebacks live in files under
+ARTIFACTS_DIR/<job>/<sha256>; `AgentState` only carries their handles. Every node still
+returns `{**state, ...}`, but those copies, the SSE serialization and the per-job
+memory no longer grow with the size of the code and logs. Agents call `get` on the
+fields whose content they actually read.
+
+Strings up to INLINE_MAX characters are kept inline, since a handle would save nothing.
+"""
+
+import hashlib
+import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
+
+from agents.governor import current_job
+
+ARTIFACTS_DIR = Path(os.environ.get("ARTIFACTS_DIR", "/tmp/artifacts"))
+INLINE_MAX = int(os.environ.get("ARTIFACTS_INLINE_MAX", "1024"))
+
+_PREFIX = "artifact://"
+
+
+def is_handle(value) -> bool:
+  return isinstance(value, str) and value.startswith(_PREFIX)
+
+
+def put(text: str) -> str:
+  """Store *text* for the current job; returns its handle (or *text* itself if small)."""
+  if not isinstance(text, str) or len(text) <= INLINE_MAX or is_handle(text):
+    return text
+  digest = hashlib.sha256(text.encode()).hexdigest()
+  rel = f"{current_job()}/{digest}"
+  path = ARTIFACTS_DIR / rel
+  if not path.exists():
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(text)
+    tmp.replace(path)
+  return _PREFIX + rel
+
+
+@lru_cache(maxsize=128)
+def _read(rel: str) -> str:
+  # Content-addressed, so a cached read can never go stale
+  return (ARTIFACTS_DIR / rel).read_text()
+
+
+def get(value):
+  """Content behind a handle; any other value is returned unchanged."""
+  if is_handle(value):
+    return _read(value[len(_PREFIX) :])
+  return value
+
+
+def put_files(files: dict) -> dict:
+  return {path: put(source) for path, source in files.items()}
+
+
+def get_files(files: dict) -> dict:
+  return {path: get(source) for path, source in files.items()}
+
+
+def size(value) -> int:
+  """Length of the content without loading it."""
+  if is_handle(value):
+    return (ARTIFACTS_DIR / value[len(_PREFIX) :]).stat().st_size
+  return len(value or "")
+
+
+def discard_job(job_id: str) -> None:
+  """Delete a finished job's artifacts."""
+  shutil.rmtree(ARTIFACTS_DIR / job_id, ignore_errors=True)
@@ -0,0 +1,264 @@
+"""SQLite job broker between the API and executor workers.
+
+With `EXECUTOR_BROKER` set to a database path, `executor_agent` no longer runs the
+generated repo itself. It submits an execution task with the repo files, the imports to
+install and the modules to preload, then waits for a worker to finish it. Workers
+(`python worker.py`, any number per host) claim tasks, heartbeat while they run, and
+write back the run outcome together with the files the run produced.
+
+A task whose worker stops heartbeating is put back in the queue, up to `MAX_ATTEMPTS`
+times. Points the experiment logs to its metrics channel are relayed through the
+`task_events` table, so the job's SSE stream still receives them.
+
+SQLite in WAL mode keeps this dependency-free, but only on one host: WAL relies on shared
+memory between the processes using the database, so the file must sit on a local disk,
+never on NFS/SMB or another network filesystem. The broker surface (submit / claim /
+heartbeat / complete) is small enough to back with Redis for multi-node deployments.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+
+HEARTBEAT_INTERVAL = float(os.environ.get("BROKER_HEARTBEAT_INTERVAL", "5"))
+# A running task without a heartbeat for this long is considered orphaned
+HEARTBEAT_TIMEOUT = float(os.environ.get("BROKER_HEARTBEAT_TIMEOUT", "30"))
+MAX_ATTEMPTS = int(os.environ.get("BROKER_MAX_ATTEMPTS", "3"))
+_POLL_INTERVAL = 0.2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+  id TEXT PRIMARY KEY,
+  job TEXT NOT NULL,
+  status TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  result TEXT,
+  error TEXT,
+  worker TEXT,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  created REAL NOT NULL,
+  started REAL,
+  heartbeat REAL,
+  finished REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created);
+CREATE TABLE IF NOT EXISTS task_events (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  task TEXT NOT NULL,
+  event TEXT NOT NULL,
+  data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_events_task ON task_events (task, seq);
+CREATE TABLE IF NOT EXISTS workers (
+  id TEXT PRIMARY KEY,
+  host TEXT NOT NULL,
+  slots INTEGER NOT NULL,
+  heartbeat REAL NOT NULL
+);
+"""
+
+_initialized: set[str] = set()
+_init_lock = threading.Lock()
+
+
+class TaskFailed(RuntimeError):
+  pass
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+  conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+  conn.row_factory = sqlite3.Row
+  with _init_lock:
+    if db_path not in _initialized:
+      Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.executescript(_SCHEMA)
+      _initialized.add(db_path)
+  return conn
+
+
+def worker_id(slot: int = 0) -> str:
+  return f"{socket.gethostname()}:{os.getpid()}:{slot}"
+
+
+# ---------------------------------------------------------------------------
+# API side
+# ---------------------------------------------------------------------------
+
+
+def submit(db_path: str, job: str, payload: dict) -> str:
+  task_id = uuid.uuid4().hex
+  with closing(_connect(db_path)) as conn:
+    conn.execute(
+      "INSERT INTO tasks (id, job, status, payload, created) VALUES (?, ?, 'queued', ?, ?)",
+      (task_id, job, json.dumps(payload), time.time()),
+    )
+  return task_id
+
+
+def run_task(db_path: str, job: str, payload: dict, timeout: float, on_event=None) -> dict:
+  """Submit *payload* and block until a worker finishes it.
+
+  *on_event(event, data)* receives events the worker relays while running. Raises
+  TaskFailed if the task fails or doesn't finish within *timeout* seconds.
+  """
+  task_id = submit(db_path, job, payload)
+  deadline = time.monotonic() + timeout
+  last_seq = 0
+  print(f"[Broker] Submitted task {task_id} for job {job}")
+  with closing(_connect(db_path)) as conn:
+    while True:
+      for row in conn.execute(
+        "SELECT seq, event, data FROM task_events WHERE task = ? AND seq > ? ORDER BY seq",
+        (task_id, last_seq),
+      ):
+        last_seq = row["seq"]
+        if on_event is not None:
+          on_event(row["event"], json.loads(row["data"]))
+      row = conn.execute(
+        "SELECT status, result, error, worker, attempts FROM tasks WHERE id = ?", (task_id,)
+      ).fetchone()
+      if row["status"] == "done":
+        conn.execute("DELETE FROM task_events WHERE task = ?", (task_id,))
+        conn.execute("UPDATE tasks SET result = NULL WHERE id = ?", (task_id,))
+        print(f"[Broker] Task {task_id} done on {row['worker']} (attempt {row['attempts']})")
+        return json.loads(row["result"])
+      if row["status"] == "failed":
+        raise TaskFailed(row["error"] or "task failed")
+      if time.monotonic() >= deadline:
+        cancel(db_path, task_id)
+        raise TaskFailed(f"No worker finished the task within {timeout:.0f}s")
+      requeue_stale(db_path)
+      time.sleep(_POLL_INTERVAL)
+
+
+def cancel(db_path: str, task_id: str) -> None:
+  with closing(_connect(db_path)) as conn:
+    conn.execute(
+      "UPDATE tasks SET status = 'failed', error = 'cancelled', finished = ? "
+      "WHERE id = ? AND status IN ('queued', 'running')",
+      (time.time(), task_id),
+    )
+
+
+def requeue_stale(db_path: str) -> int:
+  """Put tasks whose worker stopped heartbeating back in the queue (or fail them)."""
+  cutoff = time.time() - HEARTBEAT_TIMEOUT
+  with closing(_connect(db_path)) as conn:
+    conn.execute("BEGIN IMMEDIATE")
+    stale = conn.execute(
+      "SELECT id, worker, attempts FROM tasks WHERE status = 'running' AND heartbeat < ?",
+      (cutoff,),
+    ).fetchall()
+    for row in stale:
+      if row["attempts"] >= MAX_ATTEMPTS:
+        conn.execute(
+          "UPDATE tasks SET status = 'failed', error = ?, finished = ? WHERE id = ?",
+          (f"worker lost the task {row['attempts']} time(s)", time.time(), row["id"]),
+        )
+        print(f"[Broker] Worker {row['worker']} lost task {row['id']} — giving up")
+      else:
+        conn.execute(
+          "UPDATE tasks SET status = 'queued', worker = NULL, heartbeat = NULL WHERE id = ?",
+          (row["id"],),
+        )
+        print(f"[Broker] Worker {row['worker']} lost task {row['id']} — requeued")
+    conn.execute("COMMIT")
+  return len(stale)
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+
+def register_worker(db_path: str, worker: str, slots: int) -> None:
+  with closing(_connect(db_path)) as conn:
+    conn.execute(
+      "INSERT OR REPLACE INTO workers (id, host, slots, heartbeat) VALUES (?, ?, ?, ?)",
+      (worker, socket.gethostname(), slots, time.time()),
+    )
+
+
+def claim(db_path: str, worker: str) -> tuple[str, dict] | None:
+  """Atomically take the oldest queued task; returns (task_id, payload) or None."""
+  now = time.time()
+  with closing(_connect(db_path)) as conn:
+    conn.execute("BEGIN IMMEDIATE")
+    row = conn.execute(
+      "SELECT id, payload FROM tasks WHERE status = 'queued' ORDER BY created LIMIT 1"
+    ).fetchone()
+    if row is None:
+      conn.execute("COMMIT")
+      return None
+    conn.execute(
+      "UPDATE tasks SET status = 'running', worker = ?, attempts = attempts + 1, "
+      "started = ?, heartbeat = ? WHERE id = ?",
+      (worker, now, now, row["id"]),
+    )
+    conn.execute("COMMIT")
+  return row["id"], json.loads(row["payload"])
+
+
+def heartbeat(db_path: str, task_id: str | None, worker: str) -> bool:
+  """Refresh the worker (and its task); False if the task was taken away from this worker."""
+  now = time.time()
+  with closing(_connect(db_path)) as conn:
+    conn.execute("UPDATE workers SET heartbeat = ? WHERE id = ?", (now, worker))
+    if task_id is None:
+      return True
+    cursor = conn.execute(
+      "UPDATE tasks SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+      (now, task_id, worker),
+    )
+    return cursor.rowcount == 1
+
+
+def add_event(db_path: str, task_id: str, event: str, data: dict) -> None:
+  with closing(_connect(db_path)) as conn:
+    conn.execute(
+      "INSERT INTO task_events (task, event, data) VALUES (?, ?, ?)",
+      (task_id, event, json.dumps(data)),
+    )
+
+
+def complete(db_path: str, task_id: str, worker: str, result: dict) -> bool:
+  """Store the result unless the task was requeued to another worker meanwhile."""
+  with closing(_connect(db_path)) as conn:
+    cursor = conn.execute(
+      "UPDATE tasks SET status = 'done', result = ?, finished = ? "
+      "WHERE id = ? AND worker = ? AND status = 'running'",
+      (json.dumps(result), time.time(), task_id, worker),
+    )
+    return cursor.rowcount == 1
+
+
+def fail(db_path: str, task_id: str, worker: str, error: str) -> None:
+  with closing(_connect(db_path)) as conn:
+    conn.execute(
+      "UPDATE tasks SET status = 'failed', error = ?, finished = ? "
+      "WHERE id = ? AND worker = ? AND status = 'running'",
+      (error, time.time(), task_id, worker),
+    )
+
+
+def broker_stats(db_path: str) -> dict:
+  with closing(_connect(db_path)) as conn:
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+    live = conn.execute(
+      "SELECT COUNT(*), COALESCE(SUM(slots), 0) FROM workers WHERE heartbeat >= ?",
+      (time.time() - HEARTBEAT_TIMEOUT,),
+    ).fetchone()
+    oldest = conn.execute("SELECT MIN(created) FROM tasks WHERE status = 'queued'").fetchone()[0]
+  return {
+    "tasks": counts,
+    "workers": live[0],
+    "slots": live[1],
+    "oldest_queued_s": round(time.time() - oldest, 3) if oldest else None,
+  }
@@ -0,0 +1,119 @@
+"""Per-job token, cost and wall-clock budgets.
+
+Every LLM call made under a job's `job_scope` is charged to that job: tokens from the
+provider's usage metadata (or a ~4 chars/token estimate when the model reports none) and
+cost from the model's per-million-token prices. Wall time counts from
+`start`. The graph's routers check `level()` at every node boundary:
+
+- "ok": normal operation.
+- "degraded" (any budget past JOB_BUDGET_DEGRADE_AT): no vectorization pass, no further
+  review loops, and the debugger may only patch; a recode ends the run instead.
+- "exhausted": the run goes straight to `finalize`, which falls back to the best passing
+  revision, and then to publishing.
+
+A limit of 0 disables that budget.
+"""
+
+import os
+import threading
+import time
+
+from agents.governor import current_job
+
+JOB_TOKEN_BUDGET = int(os.environ.get("JOB_TOKEN_BUDGET", "600000"))
+JOB_COST_BUDGET = float(os.environ.get("JOB_COST_BUDGET", "0"))
+JOB_WALL_BUDGET = float(os.environ.get("JOB_WALL_BUDGET", "1800"))
+JOB_BUDGET_DEGRADE_AT = float(os.environ.get("JOB_BUDGET_DEGRADE_AT", "0.8"))
+
+_lock = threading.Lock()
+_jobs: dict[str, dict] = {}
+
+
+def _job(job_id: str) -> dict:
+  # Callers hold _lock
+  job = _jobs.get(job_id)
+  if job is None:
+    job = _jobs[job_id] = {
+      "started": time.monotonic(),
+      "tokens": 0,
+      "cost_usd": 0.0,
+      "calls": 0,
+      "degradations": [],
+    }
+  return job
+
+
+def start(job_id: str) -> None:
+  with _lock:
+    _job(job_id)
+
+
+def finish(job_id: str) -> dict:
+  """Final usage for *job_id*; forgets the job."""
+  report = usage(job_id)
+  with _lock:
+    _jobs.pop(job_id, None)
+  return report
+
+
+def charge(tokens_in: int, tokens_out: int, cost_usd: float) -> None:
+  with _lock:
+    job = _job(current_job())
+    job["tokens"] += tokens_in + tokens_out
+    job["cost_usd"] += cost_usd
+    job["calls"] += 1
+
+
+def _fractions(job: dict) -> dict[str, float]:
+  elapsed = time.monotonic() - job["started"]
+  fractions = {}
+  for name, used, limit in (
+    ("tokens", job["tokens"], JOB_TOKEN_BUDGET),
+    ("cost", job["cost_usd"], JOB_COST_BUDGET),
+    ("wall", elapsed, JOB_WALL_BUDGET),
+  ):
+    if limit:
+      fractions[name] = used / limit
+  return fractions
+
+
+def level(job_id: str | None = None) -> str:
+  with _lock:
+    fractions = _fractions(_job(job_id or current_job()))
+  worst = max(fractions.values(), default=0.0)
+  if worst >= 1.0:
+    return "exhausted"
+  if worst >= JOB_BUDGET_DEGRADE_AT:
+    return "degraded"
+  return "ok"
+
+
+def degrade(action: str) -> None:
+  """Record a degradation decision so it shows up in the job's budget report."""
+  with _lock:
+    job = _job(current_job())
+    if action not in job["degradations"]:
+      job["degradations"].append(action)
+  print(f"[Budget] {current_job()}: {action}")
+
+
+def usage(job_id: str | None = None) -> dict:
+  job_id = job_id or current_job()
+  with _lock:
+    job = _job(job_id)
+    fractions = _fractions(job)
+    report = {
+      "tokens": job["tokens"],
+      "cost_usd": round(job["cost_usd"], 5),
+      "wall_s": round(time.monotonic() - job["started"], 1),
+      "llm_calls": job["calls"],
+      "limits": {
+        "tokens": JOB_TOKEN_BUDGET or None,
+        "cost_usd": JOB_COST_BUDGET or None,
+        "wall_s": JOB_WALL_BUDGET or None,
+      },
+      "used": {name: round(fraction, 3) for name, fraction in fractions.items()},
+      "degradations": list(job["degradations"]),
+    }
+  report["level"] = level(job_id)
+  return report
@@ -0,0 +1,167 @@
+"""Memory-bounded capture of sandbox output.
+
+A generated script that prints arrays every iteration can write hundreds of MB, and
+everything captured ends up in the state, `run.log`, prompts and the SSE stream. Commands
+are therefore read through a head buffer and a tail ring buffer: the API keeps the first
+EXECUTOR_OUTPUT_HEAD_KB and last EXECUTOR_OUTPUT_TAIL_KB of each stream (the tail is
+larger since tracebacks and final metrics come last), joined by a marker saying how much
+was left out and where the full stream is. The full stream goes to a log file, up to
+EXECUTOR_OUTPUT_SPILL_MB.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+from pathlib import Path
+
+EXECUTOR_OUTPUT_HEAD_KB = int(os.environ.get("EXECUTOR_OUTPUT_HEAD_KB", "16"))
+EXECUTOR_OUTPUT_TAIL_KB = int(os.environ.get("EXECUTOR_OUTPUT_TAIL_KB", "48"))
+EXECUTOR_OUTPUT_SPILL_MB = float(os.environ.get("EXECUTOR_OUTPUT_SPILL_MB", "256"))
+
+_CHUNK = 64 * 1024
+
+
+def spill_path(prefix: Path | None, stream: str) -> Path | None:
+  return prefix.with_name(f"{prefix.name}.{stream}.log") if prefix else None
+
+
+def _marker(omitted: int, total: int, spill: Path | None) -> str:
+  if spill is None:
+    where = "not kept"
+  elif total > EXECUTOR_OUTPUT_SPILL_MB * 2**20:
+    where = f"first {EXECUTOR_OUTPUT_SPILL_MB:g} MB in {spill}"
+  else:
+    where = f"full output in {spill}"
+  return f"\n... [{omitted} bytes omitted; {where}] ...\n"
+
+
+class BoundedBuffer:
+  """Head bytes plus a tail ring of one stream, with the stream spilled to *spill*."""
+
+  def __init__(self, spill: Path | None = None):
+    self.head = bytearray()
+    self.tail = bytearray()
+    self.total = 0
+    self.spill = spill
+    self._spilled = 0
+    self._file = None
+    # A reader that outlives its command may still feed while the result is read
+    self._lock = threading.Lock()
+    if spill is not None:
+      spill.parent.mkdir(parents=True, exist_ok=True)
+      self._file = open(spill, "wb")
+
+  def feed(self, chunk: bytes) -> None:
+    with self._lock:
+      self._feed(chunk)
+
+  def _feed(self, chunk: bytes) -> None:
+    self.total += len(chunk)
+    if self._file is not None:
+      room = int(EXECUTOR_OUTPUT_SPILL_MB * 2**20) - self._spilled
+      if room > 0:
+        self._file.write(chunk[:room])
+        self._spilled += min(room, len(chunk))
+    head_room = EXECUTOR_OUTPUT_HEAD_KB * 1024 - len(self.head)
+    if head_room > 0:
+      self.head += chunk[:head_room]
+      chunk = chunk[head_room:]
+    self.tail += chunk
+    excess = len(self.tail) - EXECUTOR_OUTPUT_TAIL_KB * 1024
+    if excess > 0:
+      del self.tail[:excess]
+
+  def close(self) -> None:
+    with self._lock:
+      if self._file is not None:
+        self._file.close()
+        self._file = None
+
+  def text(self) -> str:
+    with self._lock:
+      return self._text()
+
+  def _text(self) -> str:
+    omitted = self.total - len(self.head) - len(self.tail)
+    if omitted <= 0:
+      return (self.head + self.tail).decode(errors="replace")
+    return (
+      self.head.decode(errors="replace")
+      + _marker(omitted, self.total, self.spill)
+      + self.tail.decode(errors="replace")
+    )
+
+
+def excerpt_file(path: Path, spill: Path | None = None) -> str:
+  """Bounded excerpt of an output file written by someone else; the file moves to *spill*."""
+  try:
+    size = path.stat().st_size
+  except FileNotFoundError:
+    return ""
+  head_size = EXECUTOR_OUTPUT_HEAD_KB * 1024
+  tail_size = EXECUTOR_OUTPUT_TAIL_KB * 1024
+  with open(path, "rb") as f:
+    if size <= head_size + tail_size:
+      text = f.read().decode(errors="replace")
+    else:
+      head = f.read(head_size)
+      f.seek(size - tail_size)
+      text = (
+        head.decode(errors="replace")
+        + _marker(size - head_size - tail_size, size, spill)
+        + f.read().decode(errors="replace")
+      )
+  if spill is not None:
+    spill.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(path, spill)
+    if size > EXECUTOR_OUTPUT_SPILL_MB * 2**20:
+      os.truncate(spill, int(EXECUTOR_OUTPUT_SPILL_MB * 2**20))
+  return text
+
+
+def _drain(pipe, buffer: BoundedBuffer) -> None:
+  fd = pipe.fileno()
+  while chunk := os.read(fd, _CHUNK):
+    buffer.feed(chunk)
+  pipe.close()
+
+
+def run_bounded(
+  cmd: list[str], cwd: Path, timeout: float, spill_prefix: Path | None = None
+) -> tuple[int | None, str, str]:
+  """Run *cmd* with bounded output capture. Returns (returncode, stdout, stderr).
+
+  The return code is None when the command timed out; its process group is killed and
+  the output up to that point is returned.
+  """
+  proc = subprocess.Popen(
+    cmd,
+    cwd=str(cwd),
+    stdout=subprocess.PIPE,
+    stderr=subprocess.PIPE,
+    start_new_session=True,
+  )
+  out = BoundedBuffer(spill_path(spill_prefix, "stdout"))
+  err = BoundedBuffer(spill_path(spill_prefix, "stderr"))
+  readers = [
+    threading.Thread(target=_drain, args=(proc.stdout, out), daemon=True),
+    threading.Thread(target=_drain, args=(proc.stderr, err), daemon=True),
+  ]
+  for reader in readers:
+    reader.start()
+  try:
+    returncode = proc.wait(timeout=timeout)
+  except subprocess.TimeoutExpired:
+    try:
+      os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+      pass
+    proc.wait()
+    returncode = None
+  for reader in readers:
+    # A detached grandchild may still hold the pipe; don't wait on it forever
+    reader.join(timeout=5)
+  out.close()
+  err.close()
+  return returncode, out.text(), err.text()
@@ -1,12 +1,161 @@
+import ast
+import contextvars
 import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
-from agents.llm import llm
-from prompts import CODER_PROMPT
+from agents import artifacts, library
+from agents.llm import get_llm
+from agents.retrieval import format_passages, retrieve
+from prompts import CODER_PROMPT, CONTINUATION_PROMPT, MODULE_CODER_PROMPT
 from state import AgentState
 
+# One LLM call per src/ module from the planner's interfaces instead of a single method.py
+MULTI_FILE = os.environ.get("CODER_MULTI_FILE", "0") == "1"
+# Follow-up requests for a file cut off by the route's max_tokens
+CODER_MAX_CONTINUATIONS = int(os.environ.get("CODER_MAX_CONTINUATIONS", "2"))
+
+# SyntaxErrors that mean the file stops early rather than being wrong. An unclosed bracket
+# or string is reported at the line that opened it, so those count wherever they are; the
+# others only at the end of the file.
+_UNCLOSED_ERRORS = ("was never closed", "unterminated")
+_EOF_ERRORS = ("unexpected EOF", "expected an indented block")
+# Longest tail of the partial output a continuation may repeat
+_MAX_OVERLAP = 2000
+
+
+def extract_code(raw: str) -> str:
+  match = re.search(r"```(?:python)?\s*([\s\S]*?)```", raw)
+  if match:
+    return match.group(1).strip()
+  if raw.lstrip().startswith("```"):
+    # Opening fence without a closing one
+    return raw.lstrip().split("\n", 1)[-1]
+  return raw
+
+
+def _ends_early(raw: str) -> bool:
+  """Whether *raw* reads as a file that stops mid-way: open fence or EOF syntax error."""
+  if raw.count("```") % 2:
+    return True
+  code = extract_code(raw)
+  try:
+    ast.parse(code)
+  except SyntaxError as exc:
+    message = str(exc.msg)
+    if any(marker in message for marker in _UNCLOSED_ERRORS):
+      return True
+    at_end = (exc.end_lineno or exc.lineno or 0) >= len(code.rstrip().splitlines())
+    return at_end and any(marker in message for marker in _EOF_ERRORS)
+  return False
+
+
+def _stitch(partial: str, continuation: str) -> str:
+  """Append *continuation* to *partial*, dropping a re-opened fence and repeated text."""
+  if partial.count("```") % 2:
+    continuation = re.sub(r"^\s*```(?:python)?[^\n]*\n", "", continuation, count=1)
+  tail = partial[-_MAX_OVERLAP:]
+  for size in range(min(len(tail), len(continuation)), 0, -1):
+    if size >= 8 and continuation.startswith(tail[-size:]):
+      return partial + continuation[size:]
+  return partial + continuation
+
+
+def _cut_off(response, raw: str) -> bool:
+  finish_reason = (getattr(response, "response_metadata", None) or {}).get("finish_reason")
+  return finish_reason == "length" or _ends_early(raw)
+
+
+def generate_code(route: str, messages: list) -> str:
+  """Code from one LLM call on *route*, continued while the reply was cut off."""
+  response = get_llm(route).invoke(messages)
+  raw = response.content
+  continuations = 0
+  while _cut_off(response, raw):
+    if continuations == CODER_MAX_CONTINUATIONS:
+      print(f"[Coder] Output still incomplete after {continuations} continuation(s)")
+      break
+    continuations += 1
+    print(
+      f"[Coder] Output cut off at {len(raw)} chars — "
+      f"requesting continuation {continuations}/{CODER_MAX_CONTINUATIONS}"
+    )
+    response = get_llm(route).invoke(
+      [*messages, AIMessage(content=raw), HumanMessage(content=CONTINUATION_PROMPT)]
+    )
+    raw = _stitch(raw, response.content)
+  return extract_code(raw)
+
+
+def module_specs(plan: dict) -> list[dict]:
+  """Planner modules that multi-file mode generates (src/*.py, excluding the package init)."""
+  specs = []
+  for spec in plan.get("modules") or []:
+    path = str(spec.get("path", "")).strip()
+    if path.startswith("src/") and path.endswith(".py") and path != "src/__init__.py":
+      specs.append({**spec, "path": path})
+  return specs
+
+
+def interfaces_text(specs: list[dict]) -> str:
+  return "\n\n".join(
+    f"# --- {spec['path']}: {spec.get('purpose', '')}\n{spec.get('interface', '')}"
+    for spec in specs
+  )
+
+
+_GLUE_PURPOSE = (
+  "Entry point: compose the src/ modules and expose run_experiment(config_path) -> dict"
+)
+
+
+def _generate_module(path: str, purpose: str, interfaces: str, context: str) -> tuple[str, str]:
+  code = generate_code(
+    "coder",
+    [
+      SystemMessage(content=MODULE_CODER_PROMPT),
+      HumanMessage(
+        content=f"""Assigned file: {path}
+Responsibility: {purpose}
+
+Module interfaces (contract shared by all files):
+{interfaces}
+
+{context}"""
+      ),
+    ],
+  )
+  print(f"[Coder] Generated {path} — {len(code)} chars")
+  return path, code
+
+
+def _generate_modules(specs: list[dict], context_for) -> tuple[str, dict]:
+  """Generate every src/ module and the method.py glue concurrently; returns (method.py, files).
+
+  *context_for(spec)* returns the paper/plan context for one module.
+  """
+  interfaces = interfaces_text(specs)
+  jobs = [*specs, {"path": "method.py", "purpose": _GLUE_PURPOSE, "interface": ""}]
+  with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+    # Copy the context per task so provider calls stay attributed to this job
+    futures = [
+      pool.submit(
+        contextvars.copy_context().run,
+        _generate_module,
+        spec["path"],
+        spec.get("purpose", ""),
+        interfaces,
+        context_for(spec),
+      )
+      for spec in jobs
+    ]
+    results = dict(future.result() for future in futures)
+  method = results.pop("method.py")
+  return method, results
+
 
 def coder_agent(state: AgentState) -> AgentState:
   plan = state["implementation_plan"]
@@ -41,33 +190,71 @@ def coder_agent(state: AgentState) -> AgentState:
     )
     print(f"[Coder] Incorporating reviewer feedback (iteration {state['review_iteration']})")
 
-  response = llm.invoke(
-    [
-      SystemMessage(content=CODER_PROMPT),
-      HumanMessage(
-        content=f"""Implementation plan:
+  # Closest verified implementations from earlier runs, as a starting point
+  references = library.lookup(plan, sections, exclude_id=library.paper_id(state))
+  reference_context = ""
+  if references:
+    print(
+      f"[Coder] Seeding with {len(references)} library reference(s): {[r['id'] for r in references]}"
+    )
+    reference_context = (
+      "\n\nVerified implementations of similar papers (they passed their tests; reuse what "
+      "matches this paper's method and ignore the rest):\n" + library.format_references(references)
+    )
+
+  index_path = state.get("paper_index_path", "")
+  missing_query = " ".join(review_feedback.get("missing", [])) if coming_from_reviewer else ""
+
+  def build_context(paper: str) -> str:
+    return f"""Implementation plan:
 {json.dumps(plan, indent=2)}
 
 Paper methodology:
-{methodology}
+{paper}
 
 Algorithms:
 {json.dumps(sections.get("algorithms", []), indent=2)}
 
 User instructions:
-{state["user_instructions"] or "None provided"}{recode_context}{review_context}"""
-      ),
-    ]
-  )
+{state["user_instructions"] or "None provided"}{reference_context}{recode_context}{review_context}"""
 
-  raw = response.content
-  match = re.search(r"```(?:python)?\s*([\s\S]*?)```", raw)
-  response = match.group(1).strip() if match else raw
+  def module_context(spec: dict) -> str:
+    # Each module only needs the passages about its own responsibility
+    query = f"{spec.get('purpose', '')} {spec.get('interface', '')} {missing_query}"
+    passages = retrieve(index_path, query, k=5)
+    return build_context(format_passages(passages) if passages else methodology)
+
+  specs = module_specs(plan) if MULTI_FILE else []
+  generated_files: dict = {}
+  if specs:
+    print(f"[Coder] Multi-file mode — generating {len(specs)} module(s) + method.py concurrently")
+    response, generated_files = _generate_modules(specs, module_context)
+  else:
+    paper = methodology
+    if missing_query:
+      # Reviewer gaps often live outside the methodology snapshot (appendix, experiments)
+      passages = retrieve(index_path, missing_query, k=4)
+      if passages:
+        paper += (
+          f"\n\nPaper passages relevant to the missing features:\n{format_passages(passages)}"
+        )
+    response = generate_code(
+      "coder",
+      [
+        SystemMessage(content=CODER_PROMPT),
+        HumanMessage(content=build_context(paper)),
+      ],
+    )
   print()
   print(response)
   print()
 
-  updates: dict = {"generated_code": response, "status": "coded"}
+  updates: dict = {
+    "generated_code": artifacts.put(response),
+    "generated_files": artifacts.put_files(generated_files),
+    "library_refs": [r["id"] for r in references],
+    "status": "coded",
+  }
   if coming_from_reviewer:
     # Reset debug budget so the new implementation gets fresh revision attempts
     updates["revision_count"] = 0
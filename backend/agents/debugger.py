@@ -1,37 +1,117 @@
+import re
+
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from agents.llm import llm
+from agents import artifacts, budget
+from agents.coder import extract_code, interfaces_text, module_specs
+from agents.executor import hot_spots_text
+from agents.fixer import try_fix
+from agents.retrieval import format_passages, retrieve
+from agents.structured import invoke_structured
 from prompts import DEBUGGER_PROMPT
 from schemas import DebuggerOutput
 from state import AgentState
 
-_structured_llm = llm.with_structured_output(DebuggerOutput)
+
+def failing_module(error: str, files: dict) -> str:
+  """Innermost traceback frame that points at a generated file; defaults to method.py."""
+  candidates = ["method.py", *files]
+  target = "method.py"
+  for match in re.finditer(r'File "([^"]+)", line \d+', error):
+    path = match.group(1).replace("\\", "/")
+    for rel in candidates:
+      if path == rel or path.endswith("/" + rel):
+        target = rel
+  return target
+
+
+def _error_query(error: str) -> str:
+  """Retrieval query from a traceback: the functions on the stack plus the final error lines."""
+  functions = re.findall(r", in (\w+)", error)
+  tail = "\n".join(error.strip().splitlines()[-8:])
+  return " ".join([*functions, tail])
 
 
 def debugger_agent(state: AgentState) -> AgentState:
   revision = state["revision_count"]
-  error = state["execution_error"]
+  error = artifacts.get(state["execution_error"])
   print(f"[Debugger] Starting — revision {revision}, error: {error[:200]!r}")
 
   error_history = state.get("error_history", [])
 
+  # Mechanical failures (missing package, config key, numpy metrics) are fixed without the LLM
+  fix = try_fix(state)
+  if fix is not None:
+    print(f"[Debugger] Deterministic fix ({fix.rule}) for {fix.signature!r}: {fix.description}")
+    return {
+      **state,
+      **fix.updates,
+      "error_history": [
+        *error_history,
+        {
+          "error": state["execution_error"],
+          "analysis": fix.description,
+          "action": "patch",
+          "guidance": None,
+          "rule": fix.rule,
+          "signature": fix.signature,
+          "failure": fix.failure,
+        },
+      ],
+      "debug_action": "patch",
+      "status": "debugged",
+    }
+
   history_text = ""
   if error_history:
     history_text = "\n\nPrevious debug attempts:\n" + "\n---\n".join(
       f"Attempt {i + 1} — Action taken: {e['action']}\n"
-      f"Error: {e['error'][:300]}\n"
+      f"Error: {artifacts.get(e['error'])[:300]}\n"
       f"Analysis: {e['analysis']}"
       for i, e in enumerate(error_history)
     )
 
+  # In multi-file mode only the module the traceback points at is sent and patched
+  files = state.get("generated_files") or {}
+  target = failing_module(error, files) if files else "method.py"
+  code = artifacts.get(files.get(target, state["generated_code"]))
+  code_text = f"Code:\n{code}"
+  if files:
+    others = [s for s in module_specs(state["implementation_plan"]) if s["path"] != target]
+    code_text = (
+      f"File to fix: {target} (return the complete corrected code for this file only)\n\n"
+      f"{code_text}\n\nOther modules' interfaces (read-only):\n{interfaces_text(others)}"
+    )
+    print(f"[Debugger] Multi-file mode — targeting {target}")
+
+  passages = retrieve(state.get("paper_index_path", ""), _error_query(error), k=3, max_chars=2000)
+  if passages:
+    code_text += f"\n\nRelevant paper passages:\n{format_passages(passages)}"
+
+  # Slow or timed-out runs: point the patch at where the time actually went
+  profile = (state.get("run_result") or {}).get("profile") or {}
+  if profile.get("slow") and profile.get("top"):
+    print(f"[Debugger] Including profile hot spots ({profile['run_seconds']}s run)")
+    code_text += f"\n\nProfile:\n{hot_spots_text(profile)}"
+
+  # Near the job budget a recode ends the run, so ask for the smallest fix that works
+  if budget.level() == "degraded":
+    print("[Debugger] Budget nearly spent — asking for a patch only")
+    code_text += (
+      "\n\nThe job's budget is nearly spent: choose action 'patch' with a minimal fix. "
+      "A recode will not be run."
+    )
+
   result: DebuggerOutput | None = None
   try:
-    result = _structured_llm.invoke([
-      SystemMessage(content=DEBUGGER_PROMPT),
-      HumanMessage(
-        content=f"Code:\n{state['generated_code']}\n\nError:\n{error}{history_text}"
-      ),
-    ])
+    result = invoke_structured(
+      "debugger",
+      DebuggerOutput,
+      [
+        SystemMessage(content=DEBUGGER_PROMPT),
+        HumanMessage(content=f"{code_text}\n\nError:\n{error}{history_text}"),
+      ],
+    )
   except Exception as exc:
     print(f"[Debugger] Structured output failed: {exc!r}")
 
@@ -48,7 +128,7 @@ def debugger_agent(state: AgentState) -> AgentState:
     new_history = [
       *error_history,
       {
-        "error": error,
+        "error": state["execution_error"],
         "analysis": fallback_analysis,
         "action": "recode",
         "guidance": fallback_guidance,
@@ -68,7 +148,7 @@ def debugger_agent(state: AgentState) -> AgentState:
   new_history = [
     *error_history,
     {
-      "error": error,
+      "error": state["execution_error"],
       "analysis": result.analysis,
       "action": result.action,
       "guidance": result.output if result.action == "recode" else None,
@@ -76,10 +156,17 @@ def debugger_agent(state: AgentState) -> AgentState:
   ]
 
   if result.action == "patch":
-    print(f"[Debugger] Patching — revised code is {len(result.output)} chars")
+    # Patches are asked for without fences, but models add them anyway
+    patch = extract_code(result.output)
+    print(f"[Debugger] Patching {target} — revised code is {len(patch)} chars")
+    patched = (
+      {"generated_code": artifacts.put(patch)}
+      if target == "method.py"
+      else {"generated_files": {**files, target: artifacts.put(patch)}}
+    )
     return {
       **state,
-      "generated_code": result.output,
+      **patched,
       "revision_count": revision + 1,
       "error_history": new_history,
       "debug_action": result.action,
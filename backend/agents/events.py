@@ -0,0 +1,39 @@
+"""Per-job side channel from graph nodes to the job's SSE stream.
+
+Nodes run in worker threads; `publish` hands events to the event loop that owns each
+subscriber's queue, so `/generate` can interleave them with the node-completion events.
+Events for jobs nobody is subscribed to are dropped.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+
+_subscribers: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(list)
+_lock = threading.Lock()
+
+
+def subscribe(job_id: str, queue: asyncio.Queue) -> None:
+  """Deliver *job_id*'s events to *queue*; call from the loop that consumes it."""
+  with _lock:
+    _subscribers[job_id].append((asyncio.get_running_loop(), queue))
+
+
+def unsubscribe(job_id: str, queue: asyncio.Queue) -> None:
+  with _lock:
+    subs = [s for s in _subscribers.get(job_id, []) if s[1] is not queue]
+    if subs:
+      _subscribers[job_id] = subs
+    else:
+      _subscribers.pop(job_id, None)
+
+
+def publish(job_id: str, event: str, data: dict) -> None:
+  """Thread-safe: queue (*event*, *data*) for every subscriber of *job_id*."""
+  with _lock:
+    subs = list(_subscribers.get(job_id, []))
+  for loop, queue in subs:
+    try:
+      loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+    except RuntimeError:
+      pass  # loop already closed
@@ -0,0 +1,258 @@
+"""Deterministic fixes for mechanical execution failures.
+
+Many executor failures don't need a model to diagnose: an import that was never
+installed, a config key the generated YAML doesn't define, numpy scalars in the returned
+metrics. The debugger asks this module first. The last traceback in the execution error
+is normalized into a signature (exception type, message with literals masked, failing
+frame), and the first rule that matches applies its fix locally. The LLM debugger only
+runs when no rule matches, a rule already failed on the same signature, or the per-pass
+fix budget is used up.
+"""
+
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from agents import artifacts
+from agents.executor import (
+  _LOCAL_MODULES,
+  _STDLIB_MODULES,
+  _default_config_value,
+  pip_name,
+)
+
+FIXER_ENABLED = os.environ.get("FIXER_ENABLED", "1") == "1"
+# Deterministic fixes allowed per coder pass before every failure goes to the LLM
+FIXER_MAX_FIXES = int(os.environ.get("FIXER_MAX_FIXES", "5"))
+
+_TRACEBACK = "Traceback (most recent call last):"
+_FRAME_RE = re.compile(r'^\s*File "([^"]+)", line (\d+), in (\S+)')
+_EXCEPTION_RE = re.compile(r"^([A-Za-z_][\w.]*)(?::\s?(.*))?$")
+_CONFIG_VAR_RE = re.compile(
+  r"(config|cfg|conf|params|hparams|hyper\w*|settings|options|opts|args)$", re.IGNORECASE
+)
+# Names the coder uses for its own helper modules; pip packages with these names are unrelated
+_GENERIC_LOCAL_NAMES = {"utils", "helpers", "config", "model", "models", "data", "common", "lib"}
+
+_RATE_NAMES = {"lr", "eta", "alpha", "beta", "rho", "step_size", "learning_rate"}
+
+_COERCE_MARKER = "# Metric coercion added by the error fixer"
+_COERCE_WRAPPER = f"""
+
+{_COERCE_MARKER}: run_experiment must return JSON-native values
+def _fixer_json_value(value):
+  if value is None or isinstance(value, (bool, int, float, str)):
+    return value
+  if isinstance(value, dict):
+    return {{str(k): _fixer_json_value(v) for k, v in value.items()}}
+  if isinstance(value, (list, tuple, set)):
+    return [_fixer_json_value(v) for v in value]
+  if hasattr(value, "tolist"):
+    return _fixer_json_value(value.tolist())
+  if hasattr(value, "item"):
+    return _fixer_json_value(value.item())
+  return str(value)
+
+
+_fixer_run_experiment = run_experiment
+
+
+def run_experiment(*args, **kwargs):
+  return _fixer_json_value(_fixer_run_experiment(*args, **kwargs))
+"""
+
+
+@dataclass
+class Frame:
+  path: str
+  line: int
+  function: str
+  source: str
+
+
+@dataclass
+class Failure:
+  exc_type: str
+  message: str
+  frames: list[Frame] = field(default_factory=list)
+
+  @property
+  def innermost(self) -> Frame | None:
+    return self.frames[-1] if self.frames else None
+
+
+@dataclass
+class Fix:
+  rule: str
+  signature: str
+  failure: str  # unmasked "ExcType: message", to detect a fix that didn't take
+  description: str
+  updates: dict
+
+
+def parse_failure(error: str) -> Failure | None:
+  """The last traceback in *error* (chained or nested in test output) as a Failure."""
+  if _TRACEBACK not in error:
+    return None
+  block = error.rsplit(_TRACEBACK, 1)[1]
+  frames: list[Frame] = []
+  for line in block.splitlines()[1:]:
+    if not line.strip():
+      continue
+    frame = _FRAME_RE.match(line)
+    if frame:
+      frames.append(Frame(frame.group(1), int(frame.group(2)), frame.group(3), ""))
+      continue
+    if line.startswith((" ", "\t")):
+      if frames and not frames[-1].source:
+        frames[-1].source = line.strip()
+      continue
+    match = _EXCEPTION_RE.match(line.strip())
+    if match:
+      return Failure(match.group(1).rsplit(".", 1)[-1], (match.group(2) or "").strip(), frames)
+    return None
+  return None
+
+
+def signature(failure: Failure) -> str:
+  """Failure with literals masked, so the same bug with different values groups together."""
+  message = re.sub(r"'[^']*'|\"[^\"]*\"", "<str>", failure.message)
+  message = re.sub(r"0x[0-9a-fA-F]+|\b\d+(\.\d+)?\b", "<n>", message)
+  where = ""
+  if failure.innermost:
+    where = f" @ {Path(failure.innermost.path).name}:{failure.innermost.function}"
+  return f"{failure.exc_type}: {message[:160]}{where}"
+
+
+# ---------------------------------------------------------------------------
+# Rules
+# ---------------------------------------------------------------------------
+
+
+def _missing_module(failure: Failure, state: dict) -> tuple[str, dict] | None:
+  """ModuleNotFoundError for a third-party package the import scan missed (dynamic or lazy imports)."""
+  if failure.exc_type != "ModuleNotFoundError":
+    return None
+  match = re.search(r"No module named '([^']+)'", failure.message)
+  if not match:
+    return None
+  top = match.group(1).split(".")[0]
+  if top in _STDLIB_MODULES or top in _LOCAL_MODULES or top in _GENERIC_LOCAL_NAMES:
+    return None
+  extra = state.get("extra_packages") or []
+  if top in extra:
+    return None
+  # Installed by the executor wherever the run executes (this host or a broker worker)
+  return (
+    f"Added {pip_name(top)!r} to the packages installed for the run (`import {top}`)",
+    {"extra_packages": [*extra, top]},
+  )
+
+
+def _guess_config_value(key: str):
+  name = key.lower()
+  if name in ("seed", "random_seed") or name.endswith("_seed"):
+    return 42
+  if name.endswith(("tol", "tolerance", "eps", "epsilon")):
+    return 0.0001
+  if name in _RATE_NAMES or "lr" in name.split("_"):
+    return 0.01
+  if name.startswith(("use_", "enable_", "is_", "with_")) or name in ("verbose", "debug"):
+    return False
+  if name == "batch_size":
+    return 32
+  if any(part in name for part in ("iter", "epoch", "steps", "rounds")):
+    return 100
+  if name.startswith(("n_", "num_")) or name.endswith(("_size", "_count", "_dim")):
+    return 10
+  return _default_config_value(key)
+
+
+def _missing_config_key(failure: Failure, state: dict) -> tuple[str, dict] | None:
+  """KeyError on a config lookup: define the key in the generated YAML configs."""
+  if failure.exc_type != "KeyError" or not failure.innermost:
+    return None
+  key = failure.message.strip("'\"")
+  if not key.isidentifier():
+    return None
+  source = failure.innermost.source
+  lookup = re.search(rf"""([\w.]+)\[['"]{re.escape(key)}['"]\]""", source)
+  if not lookup or not _CONFIG_VAR_RE.search(lookup.group(1).split(".")[-1]):
+    return None
+  overrides = state.get("config_overrides") or {}
+  if key in overrides:
+    return None
+  value = _guess_config_value(key)
+  return (
+    f"Added missing config key {key!r} = {value!r} to configs/*.yaml",
+    {"config_overrides": {**overrides, key: value}},
+  )
+
+
+def _non_json_metrics(failure: Failure, state: dict) -> tuple[str, dict] | None:
+  """numpy/torch scalars or arrays in the metrics: coerce run_experiment's return value."""
+  serializable = failure.exc_type == "TypeError" and "is not JSON serializable" in failure.message
+  contract = failure.exc_type == "AssertionError" and "has unsupported type" in failure.message
+  code = artifacts.get(state.get("generated_code", ""))
+  if not (serializable or contract) or _COERCE_MARKER in code:
+    return None
+  if not re.search(r"^def run_experiment\(", code, re.MULTILINE):
+    return None
+  return (
+    "Wrapped run_experiment to convert metric values to JSON-native types",
+    {"generated_code": artifacts.put(code.rstrip() + "\n" + _COERCE_WRAPPER)},
+  )
+
+
+RULES = [
+  ("missing_module", _missing_module),
+  ("missing_config_key", _missing_config_key),
+  ("non_json_metrics", _non_json_metrics),
+]
+
+_stats_lock = threading.Lock()
+_applied: Counter = Counter()
+_unmatched: Counter = Counter()
+
+
+def try_fix(state: dict) -> Fix | None:
+  """Apply the first matching deterministic fix for the execution error, if any."""
+  if not FIXER_ENABLED:
+    return None
+  failure = parse_failure(artifacts.get(state.get("execution_error", "")))
+  if failure is None:
+    return None
+  sig = signature(failure)
+  history = state.get("error_history", [])
+  # Only this coder pass counts: everything up to the last recode was another implementation
+  recodes = [i for i, e in enumerate(history) if e.get("action") == "recode"]
+  current = history[recodes[-1] + 1 :] if recodes else history
+  already = [e for e in current if e.get("rule")]
+  exact = f"{failure.exc_type}: {failure.message}"
+  if len(already) >= FIXER_MAX_FIXES or any(e.get("failure") == exact for e in already):
+    # The same failure survived a local fix; let the model look at it
+    return None
+
+  for rule, apply in RULES:
+    result = apply(failure, state)
+    if result is not None:
+      description, updates = result
+      with _stats_lock:
+        _applied[rule] += 1
+      return Fix(rule, sig, exact, description, updates)
+  with _stats_lock:
+    _unmatched[sig] += 1
+  return None
+
+
+def fixer_stats() -> dict:
+  with _stats_lock:
+    return {
+      "enabled": FIXER_ENABLED,
+      "applied": dict(_applied),
+      "llm_rounds_saved": sum(_applied.values()),
+      "top_unmatched": [{"signature": s, "count": n} for s, n in _unmatched.most_common(10)],
+    }
@@ -0,0 +1,383 @@
+"""Fork-server execution for sandbox runs.
+
+A long-lived template interpreter preloads the scientific libraries a run needs (numpy,
+scipy, torch, ...) once. Every test/experiment execution is forked from it, so it starts
+with those imports already done instead of paying seconds of import time per spawn.
+
+Per request the template forks a supervisor, which forks the worker that runs the
+command in its own cwd and process group with rlimits applied and stdout/stderr written
+to files. The supervisor enforces the timeout and reports the exit status back over the
+Unix socket.
+
+This file runs standalone as the template (`python forkserver.py --socket ... --preload
+...`) and only imports the standard library at module level.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+_KILL_GRACE = 2.0
+_SECRET_SUFFIXES = ("_API_KEY", "_TOKEN", "_SECRET")
+
+
+# ---------------------------------------------------------------------------
+# Template side
+# ---------------------------------------------------------------------------
+
+
+def _apply_rlimits(limits: dict) -> None:
+  import resource
+
+  for name, value in limits.items():
+    if not value:
+      continue
+    key = getattr(resource, name, None)
+    if key is None:
+      continue
+    resource.setrlimit(key, (int(value), int(value)))
+
+
+def _worker(request: dict) -> None:
+  """Grandchild: becomes the command. Never returns."""
+  code = 1
+  try:
+    os.setpgid(0, 0)
+    os.chdir(request["cwd"])
+    _apply_rlimits(request.get("rlimits") or {})
+    os.environ.update(request.get("env") or {})
+
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    out = os.open(request["stdout_path"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    err = os.open(request["stderr_path"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.dup2(devnull, 0)
+    os.dup2(out, 1)
+    os.dup2(err, 2)
+    sys.stdin = open(0, closefd=False)
+    sys.stdout = open(1, "w", buffering=1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+
+    import runpy
+
+    importlib.invalidate_caches()
+    argv = list(request["argv"])
+    if argv[:1] == ["-m"]:
+      sys.argv = argv[1:]
+      sys.path.insert(0, request["cwd"])
+      runpy.run_module(argv[1], run_name="__main__", alter_sys=True)
+    elif argv[:1] == ["-c"]:
+      sys.argv = ["-c", *argv[2:]]
+      sys.path.insert(0, "")
+      exec(compile(argv[1], "<string>", "exec"), {"__name__": "__main__"})
+    else:
+      sys.argv = argv
+      sys.path.insert(0, str(Path(argv[0]).resolve().parent))
+      runpy.run_path(argv[0], run_name="__main__")
+    code = 0
+  except SystemExit as exc:
+    if exc.code is None:
+      code = 0
+    elif isinstance(exc.code, int):
+      code = exc.code
+    else:
+      print(exc.code, file=sys.stderr)
+      code = 1
+  except BaseException as exc:
+    import traceback
+
+    # Drop this frame so the traceback reads like a plain `python` run
+    traceback.print_exception(type(exc), exc, exc.__traceback__.tb_next)
+    code = 1
+  finally:
+    try:
+      sys.stdout.flush()
+      sys.stderr.flush()
+    finally:
+      os._exit(code)
+
+
+def _supervise(conn: socket.socket, request: dict) -> None:
+  """Child: fork the worker, enforce the timeout, report the result. Never returns."""
+  signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+  started = time.monotonic()
+  pid = os.fork()
+  if pid == 0:
+    conn.close()
+    _worker(request)
+
+  deadline = started + float(request["timeout"])
+  timed_out = False
+  status = None
+  while status is None:
+    done, raw = os.waitpid(pid, os.WNOHANG)
+    if done:
+      status = raw
+      break
+    if time.monotonic() >= deadline:
+      timed_out = True
+      _kill_group(pid, signal.SIGTERM)
+      grace_end = time.monotonic() + _KILL_GRACE
+      while time.monotonic() < grace_end:
+        done, raw = os.waitpid(pid, os.WNOHANG)
+        if done:
+          status = raw
+          break
+        time.sleep(0.02)
+      if status is None:
+        _kill_group(pid, signal.SIGKILL)
+        _, status = os.waitpid(pid, 0)
+      break
+    time.sleep(0.01)
+
+  result = {
+    "returncode": os.waitstatus_to_exitcode(status),
+    "timed_out": timed_out,
+    "duration": time.monotonic() - started,
+  }
+  try:
+    conn.sendall((json.dumps(result) + "\n").encode())
+  finally:
+    os._exit(0)
+
+
+def _kill_group(pid: int, sig: int) -> None:
+  try:
+    os.killpg(pid, sig)
+  except ProcessLookupError:
+    pass
+
+
+def _read_line(conn: socket.socket) -> bytes:
+  chunks = []
+  while True:
+    chunk = conn.recv(65536)
+    if not chunk:
+      break
+    chunks.append(chunk)
+    if chunk.endswith(b"\n"):
+      break
+  return b"".join(chunks)
+
+
+def serve(socket_path: str, preload: list[str]) -> None:
+  loaded, failed = [], []
+  for name in preload:
+    try:
+      importlib.import_module(name)
+      loaded.append(name)
+    except Exception:
+      failed.append(name)
+
+  listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  listener.bind(socket_path)
+  listener.listen(64)
+  listener.settimeout(1.0)
+  print(json.dumps({"ready": True, "loaded": loaded, "failed": failed}), flush=True)
+
+  while True:
+    # Reap finished supervisors
+    try:
+      while os.waitpid(-1, os.WNOHANG)[0]:
+        pass
+    except ChildProcessError:
+      pass
+    if os.getppid() == 1:
+      return  # parent API process died
+    try:
+      conn, _ = listener.accept()
+    except TimeoutError:
+      continue
+    conn.settimeout(None)
+    try:
+      request = json.loads(_read_line(conn))
+    except (OSError, ValueError):
+      conn.close()
+      continue
+    if os.fork() == 0:
+      listener.close()
+      _supervise(conn, request)
+    conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+
+def sandbox_env() -> dict:
+  """Environment for generated code: the API process env minus credentials."""
+  return {k: v for k, v in os.environ.items() if not k.endswith(_SECRET_SUFFIXES)}
+
+
+class ForkServer:
+  def __init__(self, python: Path, preload: set[str], start_timeout: float = 180):
+    self.preload = frozenset(preload)
+    # Runs in flight; a retired template is closed once they drain (guarded by _server_lock)
+    self.active = 0
+    self.retired = False
+    self._dir = Path(tempfile.mkdtemp(prefix="descartes_fork_"))
+    self.socket_path = str(self._dir / "server.sock")
+    self.proc = subprocess.Popen(
+      [
+        str(python),
+        __file__,
+        "--socket",
+        self.socket_path,
+        "--preload",
+        ",".join(sorted(preload)),
+      ],
+      cwd=self._dir,
+      env=sandbox_env(),
+      stdin=subprocess.DEVNULL,
+      stdout=subprocess.PIPE,
+      stderr=subprocess.DEVNULL,
+      text=True,
+      start_new_session=True,
+    )
+    ready = self._await_ready(start_timeout)
+    self.loaded = set(ready.get("loaded", []))
+    print(
+      f"[ForkServer] Template ready in {ready['startup_s']:.1f}s — preloaded {sorted(self.loaded)}"
+      + (f", unavailable {ready['failed']}" if ready.get("failed") else "")
+    )
+
+  def _await_ready(self, timeout: float) -> dict:
+    started = time.monotonic()
+    line: list[str] = []
+    reader = threading.Thread(target=lambda: line.append(self.proc.stdout.readline()), daemon=True)
+    reader.start()
+    reader.join(timeout)
+    if not line or not line[0].strip():
+      self.close()
+      raise RuntimeError("Fork server failed to start")
+    return {**json.loads(line[0]), "startup_s": time.monotonic() - started}
+
+  def alive(self) -> bool:
+    return self.proc.poll() is None
+
+  def run(
+    self,
+    argv: list[str],
+    cwd: Path,
+    timeout: int,
+    rlimits: dict | None = None,
+    spill_prefix: Path | None = None,
+  ) -> tuple[bool, str, str, bool]:
+    """Run python *argv* (script, -m module or -c code) forked from the template.
+
+    Returns (ok, stdout, stderr, timed_out) with bounded output excerpts; the full output
+    files are moved next to *spill_prefix* when given.
+    """
+    from agents.capture import excerpt_file, spill_path
+
+    run_dir = Path(tempfile.mkdtemp(prefix="run_", dir=self._dir))
+    request = {
+      "argv": argv,
+      "cwd": str(cwd),
+      "timeout": timeout,
+      "rlimits": rlimits or {},
+      "stdout_path": str(run_dir / "stdout"),
+      "stderr_path": str(run_dir / "stderr"),
+    }
+    try:
+      with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout + _KILL_GRACE + 30)
+        conn.connect(self.socket_path)
+        conn.sendall((json.dumps(request) + "\n").encode())
+        result = json.loads(_read_line(conn))
+      stdout = excerpt_file(run_dir / "stdout", spill_path(spill_prefix, "stdout"))
+      stderr = excerpt_file(run_dir / "stderr", spill_path(spill_prefix, "stderr"))
+    finally:
+      shutil.rmtree(run_dir, ignore_errors=True)
+    return result["returncode"] == 0, stdout, stderr, result["timed_out"]
+
+  def close(self) -> None:
+    if self.proc.poll() is None:
+      self.proc.terminate()
+      try:
+        self.proc.wait(timeout=5)
+      except subprocess.TimeoutExpired:
+        self.proc.kill()
+    shutil.rmtree(self._dir, ignore_errors=True)
+
+
+_server: ForkServer | None = None
+# Guards _server and the run counts; never held while a template starts
+_server_lock = threading.Lock()
+# Serializes template starts, so concurrent cold callers share one new template
+_start_lock = threading.Lock()
+
+
+def _retire(server: ForkServer) -> None:
+  # Caller holds _server_lock
+  server.retired = True
+  if server.active == 0:
+    server.close()
+
+
+def _acquire(preload: frozenset[str] | set[str]) -> ForkServer | None:
+  """The current template with one more run counted, if it is alive and covers *preload*."""
+  with _server_lock:
+    if _server is None or not _server.alive() or not preload <= _server.preload:
+      return None
+    _server.active += 1
+    return _server
+
+
+@contextmanager
+def lease(python: Path, preload: set[str]):
+  """Shared template for one run; restarted with the union of modules when *preload* grows.
+
+  The replacement starts in its own directory without holding the lock that runs on the
+  current template need, and is published once ready. A template that other jobs are
+  still running on is retired and only closed once their runs finish, since closing it
+  removes their sockets and output files.
+  """
+  global _server
+  server = _acquire(preload)
+  if server is None:
+    with _start_lock:
+      # Another caller may have started a suitable template while this one waited
+      server = _acquire(preload)
+      if server is None:
+        with _server_lock:
+          current = _server
+        wanted = set(preload)
+        if current is not None and current.alive():
+          wanted |= current.preload
+        fresh = ForkServer(python, wanted)
+        with _server_lock:
+          if _server is not None:
+            _retire(_server)
+          _server = server = fresh
+          server.active += 1
+  try:
+    yield server
+  finally:
+    with _server_lock:
+      server.active -= 1
+      if server.retired and server.active == 0:
+        server.close()
+
+
+if __name__ == "__main__":
+  # Run as a script, this directory comes first on sys.path and the agent modules in it
+  # would shadow the generated code's own imports (parser, events, budget, ...)
+  if sys.path and Path(sys.path[0]).resolve() == Path(__file__).resolve().parent:
+    del sys.path[0]
+  parser = argparse.ArgumentParser(description="Descartes fork-server template process")
+  parser.add_argument("--socket", required=True)
+  parser.add_argument("--preload", default="")
+  args = parser.parse_args()
+  serve(args.socket, [name for name in args.preload.split(",") if name])
@@ -6,6 +6,7 @@ from pathlib import Path
 
 import httpx
 
+from agents.executor import OUTPUT_LOG_DIR
 from state import AgentState
 
 
@@ -23,9 +24,11 @@ def _build_repo_name(state: AgentState) -> str:
 
 
 def _list_files(repo_dir: Path) -> list[Path]:
+  # Spilled output logs can be hundreds of MB; the repo keeps run.log's excerpts instead
+  log_dir = repo_dir / OUTPUT_LOG_DIR
   files: list[Path] = []
   for path in repo_dir.rglob("*"):
-    if path.is_file() and "__pycache__" not in path.parts:
+    if path.is_file() and "__pycache__" not in path.parts and not path.is_relative_to(log_dir):
       files.append(path)
   return files
 
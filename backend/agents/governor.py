@@ -0,0 +1,255 @@
+"""Process-wide concurrency governor and token-bucket rate limiter for provider calls.
+
+Each provider (DeepSeek via `get_llm`, Mistral via `get_mistral`) has a cap on in-flight
+requests plus requests-per-minute and tokens-per-minute buckets. Waiting calls are
+queued per job and granted round-robin across jobs, so one job's burst cannot starve
+the others and the process stays at the provider ceiling instead of tripping 429s.
+"""
+
+import contextvars
+import itertools
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+_current_job: contextvars.ContextVar[str] = contextvars.ContextVar("current_job", default="default")
+
+
+def current_job() -> str:
+  return _current_job.get()
+
+
+@contextmanager
+def job_scope(job_id: str):
+  """Attribute provider calls made in this context (and nodes run from it) to *job_id*."""
+  token = _current_job.set(job_id)
+  try:
+    yield
+  finally:
+    try:
+      _current_job.reset(token)
+    except ValueError:
+      # Async generators can be finalized from a different context than they started in.
+      pass
+
+
+@dataclass(frozen=True)
+class ProviderLimits:
+  max_concurrent: int
+  rpm: float
+  tpm: float  # 0 disables the token bucket
+
+
+def _limits(prefix: str, max_concurrent: int, rpm: float, tpm: float) -> ProviderLimits:
+  return ProviderLimits(
+    max_concurrent=int(os.environ.get(f"{prefix}_MAX_CONCURRENT", max_concurrent)),
+    rpm=float(os.environ.get(f"{prefix}_RPM", rpm)),
+    tpm=float(os.environ.get(f"{prefix}_TPM", tpm)),
+  )
+
+
+PROVIDER_LIMITS: dict[str, ProviderLimits] = {
+  "deepseek": _limits("DEEPSEEK", max_concurrent=16, rpm=300, tpm=1_000_000),
+  "mistral": _limits("MISTRAL", max_concurrent=4, rpm=60, tpm=0),
+}
+
+_WAIT_WINDOW = 500
+
+
+class TokenBucket:
+  def __init__(self, per_minute: float):
+    self.rate = per_minute / 60.0
+    self.capacity = per_minute
+    self.level = per_minute
+    self.stamp = time.monotonic()
+
+  def _refill(self) -> None:
+    now = time.monotonic()
+    self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+    self.stamp = now
+
+  def wait_for(self, amount: float) -> float:
+    """Seconds until *amount* is available (0 if available now)."""
+    self._refill()
+    amount = min(amount, self.capacity)
+    if self.level >= amount:
+      return 0.0
+    return (amount - self.level) / self.rate
+
+  def take(self, amount: float) -> None:
+    self._refill()
+    self.level -= min(amount, self.capacity)
+
+  def give(self, amount: float) -> None:
+    self._refill()
+    self.level = min(self.capacity, self.level + amount)
+
+
+@dataclass
+class Ticket:
+  provider: str
+  job: str
+  tokens: float
+  seq: int
+  enqueued: float
+  granted: bool = False
+
+
+class _Provider:
+  def __init__(self, name: str, limits: ProviderLimits):
+    self.name = name
+    self.limits = limits
+    self.cond = threading.Condition()
+    self.in_flight = 0
+    self.queues: OrderedDict[str, deque[Ticket]] = OrderedDict()
+    self.requests = TokenBucket(limits.rpm) if limits.rpm > 0 else None
+    self.tokens = TokenBucket(limits.tpm) if limits.tpm > 0 else None
+    self.paused_until = 0.0
+    self.granted = 0
+    self.timeouts = 0
+    self.waits: deque[float] = deque(maxlen=_WAIT_WINDOW)
+
+  def _head(self) -> Ticket | None:
+    for queue in self.queues.values():
+      if queue:
+        return queue[0]
+    return None
+
+  def _capacity_wait(self, ticket: Ticket) -> float | None:
+    """None if blocked on concurrency; otherwise seconds until the buckets allow *ticket*."""
+    if self.in_flight >= self.limits.max_concurrent:
+      return None
+    wait = max(0.0, self.paused_until - time.monotonic())
+    if self.requests is not None:
+      wait = max(wait, self.requests.wait_for(1))
+    if self.tokens is not None:
+      wait = max(wait, self.tokens.wait_for(ticket.tokens))
+    return wait
+
+  def _grant(self, ticket: Ticket) -> None:
+    queue = self.queues[ticket.job]
+    queue.popleft()
+    # Rotate the job to the back so the next grant goes to a different job.
+    self.queues.move_to_end(ticket.job)
+    if not queue:
+      del self.queues[ticket.job]
+    if self.requests is not None:
+      self.requests.take(1)
+    if self.tokens is not None:
+      self.tokens.take(ticket.tokens)
+    self.in_flight += 1
+    self.granted += 1
+    ticket.granted = True
+    self.waits.append(time.monotonic() - ticket.enqueued)
+
+
+_seq = itertools.count()
+_providers: dict[str, _Provider] = {}
+_providers_lock = threading.Lock()
+
+
+def _provider(name: str) -> _Provider:
+  with _providers_lock:
+    if name not in _providers:
+      limits = PROVIDER_LIMITS.get(name) or ProviderLimits(max_concurrent=8, rpm=0, tpm=0)
+      _providers[name] = _Provider(name, limits)
+    return _providers[name]
+
+
+def acquire(provider: str, tokens: float = 0, timeout: float | None = None) -> Ticket | None:
+  """Block until *provider* has capacity for one request of *tokens*; None on timeout."""
+  p = _provider(provider)
+  ticket = Ticket(provider, current_job(), tokens, next(_seq), time.monotonic())
+  deadline = None if timeout is None else ticket.enqueued + timeout
+  with p.cond:
+    p.queues.setdefault(ticket.job, deque()).append(ticket)
+    while True:
+      if p._head() is ticket:
+        wait = p._capacity_wait(ticket)
+        if wait == 0.0:
+          p._grant(ticket)
+          p.cond.notify_all()
+          return ticket
+      else:
+        wait = None
+      left = None if deadline is None else deadline - time.monotonic()
+      if left is not None and left <= 0:
+        p.queues[ticket.job].remove(ticket)
+        if not p.queues[ticket.job]:
+          del p.queues[ticket.job]
+        p.timeouts += 1
+        p.cond.notify_all()
+        return None
+      waits = [w for w in (wait, left) if w is not None]
+      p.cond.wait(timeout=min(waits) if waits else None)
+
+
+def try_acquire(provider: str, tokens: float = 0) -> Ticket | None:
+  """Grant immediately if nobody is queued and capacity is free; never blocks."""
+  p = _provider(provider)
+  with p.cond:
+    if p._head() is not None:
+      return None
+    ticket = Ticket(provider, current_job(), tokens, next(_seq), time.monotonic())
+    p.queues.setdefault(ticket.job, deque()).append(ticket)
+    if p._capacity_wait(ticket) == 0.0:
+      p._grant(ticket)
+      return ticket
+    del p.queues[ticket.job]
+    return None
+
+
+def release(ticket: Ticket | None, used_tokens: float | None = None) -> None:
+  """Free the concurrency slot; reconcile the token estimate with actual usage."""
+  if ticket is None or not ticket.granted:
+    return
+  p = _provider(ticket.provider)
+  with p.cond:
+    ticket.granted = False
+    p.in_flight -= 1
+    if p.tokens is not None and used_tokens is not None:
+      if used_tokens < ticket.tokens:
+        p.tokens.give(ticket.tokens - used_tokens)
+      else:
+        p.tokens.take(used_tokens - ticket.tokens)
+    p.cond.notify_all()
+
+
+def backoff(provider: str, seconds: float) -> None:
+  """Pause grants for *provider*, e.g. after a 429 with Retry-After."""
+  p = _provider(provider)
+  with p.cond:
+    p.paused_until = max(p.paused_until, time.monotonic() + seconds)
+    p.cond.notify_all()
+
+
+def governor_stats() -> dict:
+  out = {}
+  with _providers_lock:
+    providers = list(_providers.values())
+  for p in providers:
+    with p.cond:
+      waits = sorted(p.waits)
+      out[p.name] = {
+        "limits": {
+          "max_concurrent": p.limits.max_concurrent,
+          "rpm": p.limits.rpm,
+          "tpm": p.limits.tpm,
+        },
+        "in_flight": p.in_flight,
+        "queue_depth": sum(len(q) for q in p.queues.values()),
+        "queued_by_job": {job: len(q) for job, q in p.queues.items()},
+        "granted": p.granted,
+        "timeouts": p.timeouts,
+        "paused_for_s": round(max(0.0, p.paused_until - time.monotonic()), 3),
+        "wait_p50_s": round(statistics.median(waits), 3) if waits else None,
+        "wait_p95_s": round(waits[min(len(waits) - 1, int(0.95 * (len(waits) - 1)))], 3)
+        if waits
+        else None,
+        "wait_max_s": round(waits[-1], 3) if waits else None,
+      }
+  return out
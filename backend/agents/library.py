@@ -0,0 +1,236 @@
+"""Cross-run library of verified implementations.
+
+Every coder pass whose generated repo passed its tests and experiment, and that the
+reviewer judged complete, is stored here with its plan, the paper's algorithm descriptors and the observed metrics. The coder
+looks up the closest entries (BM25 over the descriptors) and gets their code as a
+reference, so papers from an algorithm family the service has already solved don't
+start from zero.
+
+The store is bounded by entry count and total size; the least recently used entries
+are evicted first. Each pass also logs how many debug revisions it needed and whether
+it was seeded, which `library_stats()` aggregates to show whether seeding pays off.
+"""
+
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from agents import artifacts
+from agents.retrieval import bm25_scores, tokenize
+
+LIBRARY_DIR = Path(os.environ.get("LIBRARY_DIR", "/tmp/library"))
+LIBRARY_ENABLED = os.environ.get("LIBRARY_ENABLED", "1") == "1"
+LIBRARY_MAX_ENTRIES = int(os.environ.get("LIBRARY_MAX_ENTRIES", "200"))
+LIBRARY_MAX_MB = float(os.environ.get("LIBRARY_MAX_MB", "50"))
+# Minimum BM25 score for an entry to be offered to the coder
+LIBRARY_MIN_SCORE = float(os.environ.get("LIBRARY_MIN_SCORE", "3.0"))
+
+_MAX_OUTCOMES = 1000
+
+_lock = threading.Lock()
+_lookups = 0
+_hits = 0
+
+
+def _index_path() -> Path:
+  return LIBRARY_DIR / "index.json"
+
+
+def _entry_path(entry_id: str) -> Path:
+  return LIBRARY_DIR / "entries" / f"{entry_id}.json"
+
+
+def _write_json(path: Path, value) -> None:
+  # Write-then-rename so a concurrent reader never sees a half-written file
+  path.parent.mkdir(parents=True, exist_ok=True)
+  tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+  tmp.write_text(json.dumps(value))
+  tmp.replace(path)
+
+
+def _read_index() -> dict:
+  try:
+    return json.loads(_index_path().read_text())
+  except (FileNotFoundError, json.JSONDecodeError):
+    return {"entries": {}, "outcomes": []}
+
+
+def _descriptor(plan: dict, sections: dict) -> str:
+  """Text the similarity lookup matches on: what the paper's method is, not how it was coded."""
+  parts = [
+    *(sections.get("algorithms") or []),
+    plan.get("overview", ""),
+    *(plan.get("classes") or []),
+    *(plan.get("functions") or []),
+  ]
+  return "\n".join(str(part) for part in parts if part)
+
+
+def paper_id(state: dict) -> str:
+  """Stable id for the paper: the PDF hash the parser keyed its passage index on."""
+  index_path = state.get("paper_index_path") or ""
+  if index_path:
+    return Path(index_path).parent.name
+  return hashlib.sha256(state.get("pdf_path", "").encode()).hexdigest()[:16]
+
+
+def lookup(plan: dict, sections: dict, k: int = 2, exclude_id: str = "") -> list[dict]:
+  """Up to *k* stored implementations most similar to this paper, best first.
+
+  *exclude_id* is the current paper's `paper_id`: its own entry (e.g. the implementation
+  the reviewer just rejected) is never offered back as a similar paper.
+  """
+  global _lookups, _hits
+  if not LIBRARY_ENABLED:
+    return []
+  query = set(tokenize(_descriptor(plan, sections)))
+  with _lock:
+    _lookups += 1
+    index = _read_index()
+    entries = [e for e in index["entries"].values() if e["id"] != exclude_id]
+    if not entries or not query:
+      return []
+    doc_freq: Counter = Counter()
+    for entry in entries:
+      doc_freq.update(entry["terms"].keys())
+    avg_len = sum(sum(e["terms"].values()) for e in entries) / len(entries)
+    scores = bm25_scores(query, [e["terms"] for e in entries], doc_freq, avg_len)
+    ranked = sorted(
+      ((score, entry) for score, entry in zip(scores, entries) if score >= LIBRARY_MIN_SCORE),
+      key=lambda pair: pair[0],
+      reverse=True,
+    )[:k]
+
+    results = []
+    for score, entry in ranked:
+      try:
+        stored = json.loads(_entry_path(entry["id"]).read_text())
+      except (FileNotFoundError, json.JSONDecodeError):
+        continue
+      entry["last_used"] = time.time()
+      entry["uses"] = entry.get("uses", 0) + 1
+      results.append({**stored, "score": round(score, 3)})
+    if results:
+      _hits += 1
+      _write_json(_index_path(), index)
+  return results
+
+
+def format_references(references: list[dict], max_chars: int = 8000) -> str:
+  """Prompt section with the reference implementations, trimmed to *max_chars* in total."""
+  budget = max_chars
+  blocks = []
+  for ref in references:
+    files = {"method.py": ref["code"], **(ref.get("files") or {})}
+    body = "\n\n".join(f"# --- {path}\n{source}" for path, source in files.items())
+    if len(body) > budget:
+      body = body[:budget] + "\n# ... (truncated)"
+    blocks.append(
+      f"## Reference (similarity {ref['score']}): {ref['plan'].get('overview', '')[:300]}\n"
+      f"Algorithms: {'; '.join(ref.get('algorithms', []))[:500]}\n"
+      f"Verified metrics: {json.dumps(ref.get('metrics', {}))[:300]}\n"
+      f"```python\n{body}\n```"
+    )
+    budget -= len(body)
+    if budget <= 0:
+      break
+  return "\n\n".join(blocks)
+
+
+def _evict(index: dict) -> list[str]:
+  """Drop least recently used entries until the count and size budgets hold."""
+  entries = index["entries"]
+  max_bytes = LIBRARY_MAX_MB * 2**20
+  evicted = []
+  by_age = sorted(entries.values(), key=lambda e: e["last_used"])
+  total = sum(e["size"] for e in by_age)
+  while by_age and (len(entries) > LIBRARY_MAX_ENTRIES or total > max_bytes):
+    oldest = by_age.pop(0)
+    del entries[oldest["id"]]
+    total -= oldest["size"]
+    _entry_path(oldest["id"]).unlink(missing_ok=True)
+    evicted.append(oldest["id"])
+  return evicted
+
+
+def record_run(state: dict, verdict: str = "") -> None:
+  """Log this coder pass's outcome and store its code if the run passed and was complete."""
+  if not LIBRARY_ENABLED:
+    return
+  seeded = bool(state.get("library_refs"))
+  revisions = state.get("revision_count", 0)
+  success = bool(state.get("execution_success"))
+  entry_id = paper_id(state)
+
+  with _lock:
+    index = _read_index()
+    index["outcomes"] = [
+      *index["outcomes"],
+      {"seeded": seeded, "revisions": revisions, "success": success, "time": time.time()},
+    ][-_MAX_OUTCOMES:]
+
+    # A passing run the reviewer marked partial or incomplete isn't a verified implementation
+    if success and verdict == "complete":
+      plan = state.get("implementation_plan") or {}
+      sections = state.get("parsed_sections") or {}
+      stored = {
+        "id": entry_id,
+        "code": artifacts.get(state.get("generated_code", "")),
+        "files": artifacts.get_files(state.get("generated_files") or {}),
+        "plan": plan,
+        "algorithms": [str(a) for a in sections.get("algorithms") or []],
+        "metrics": state.get("observed_metrics") or {},
+        "revisions": revisions,
+        "seeded_from": state.get("library_refs") or [],
+        "verdict": verdict,
+      }
+      _write_json(_entry_path(entry_id), stored)
+      now = time.time()
+      previous = index["entries"].get(entry_id, {})
+      index["entries"][entry_id] = {
+        "id": entry_id,
+        "terms": dict(Counter(tokenize(_descriptor(plan, sections)))),
+        "size": _entry_path(entry_id).stat().st_size,
+        "created": previous.get("created", now),
+        "last_used": now,
+        "uses": previous.get("uses", 0),
+      }
+      evicted = _evict(index)
+      print(
+        f"[Library] Stored {entry_id} ({revisions} revision(s), seeded={seeded})"
+        + (f", evicted {evicted}" if evicted else "")
+      )
+    _write_json(_index_path(), index)
+
+
+def _outcome_summary(outcomes: list[dict]) -> dict:
+  if not outcomes:
+    return {"runs": 0}
+  passed = [o["revisions"] for o in outcomes if o["success"]]
+  return {
+    "runs": len(outcomes),
+    "success_rate": round(len(passed) / len(outcomes), 3),
+    "first_try_rate": round(sum(1 for r in passed if r == 0) / len(outcomes), 3),
+    "mean_revisions_to_pass": round(statistics.mean(passed), 3) if passed else None,
+  }
+
+
+def library_stats() -> dict:
+  with _lock:
+    index = _read_index()
+  entries = index["entries"].values()
+  outcomes = index["outcomes"]
+  return {
+    "enabled": LIBRARY_ENABLED,
+    "entries": len(index["entries"]),
+    "size_mb": round(sum(e["size"] for e in entries) / 2**20, 3),
+    "lookups": _lookups,
+    "hits": _hits,
+    "seeded": _outcome_summary([o for o in outcomes if o["seeded"]]),
+    "unseeded": _outcome_summary([o for o in outcomes if not o["seeded"]]),
+  }
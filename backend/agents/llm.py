@@ -1,16 +1,283 @@
+import json
 import os
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from functools import lru_cache
 
 from dotenv import load_dotenv
-from langchain_openai.chat_models.base import BaseChatOpenAI
-from mistralai import Mistral
+
+from agents import budget, transport
 
 load_dotenv()
 
-llm = BaseChatOpenAI(
-  base_url="https://api.deepseek.com/v1",
-  model="deepseek-chat",
-  api_key=os.environ["DEEPSEEK_API_KEY"],
-  max_tokens=8192,
-)
 
-mistral_client = Mistral(api_key=os.environ["MISTRAL_API_KEY"])
+@dataclass(frozen=True)
+class ModelSpec:
+  name: str
+  model: str
+  base_url: str
+  api_key_env: str
+  provider: str
+  # USD per million tokens, for per-job cost budgets
+  input_price: float = 0.0
+  output_price: float = 0.0
+
+
+@dataclass(frozen=True)
+class Route:
+  model: str
+  max_tokens: int
+  timeout: float
+  fallback: str | None = None
+
+
+# Model registry: registry name -> OpenAI-compatible endpoint. Extra models can be
+# registered with LLM_MODELS='{"name": {"model": ..., "base_url": ..., "api_key_env": ...,
+# "provider": ..., "input_price": ..., "output_price": ...}}'; the provider names the
+# governor bucket the model draws from, prices are USD per million tokens.
+MODELS: dict[str, ModelSpec] = {
+  "deepseek-chat": ModelSpec(
+    name="deepseek-chat",
+    model="deepseek-chat",
+    base_url="https://api.deepseek.com/v1",
+    api_key_env="DEEPSEEK_API_KEY",
+    provider="deepseek",
+    input_price=0.27,
+    output_price=1.10,
+  ),
+  "deepseek-reasoner": ModelSpec(
+    name="deepseek-reasoner",
+    model="deepseek-reasoner",
+    base_url="https://api.deepseek.com/v1",
+    api_key_env="DEEPSEEK_API_KEY",
+    provider="deepseek",
+    input_price=0.55,
+    output_price=2.19,
+  ),
+}
+
+# Per-agent routes. "fast" is for small structured classification steps where a short
+# token cap keeps latency low: incremental review verdicts and re-asks for small scalar fields.
+# The debugger stays on its own route since its reply carries the patched file. Each field can be overridden
+# with LLM_ROUTE_<NAME>, LLM_ROUTE_<NAME>_MAX_TOKENS, _TIMEOUT and _FALLBACK.
+ROUTES: dict[str, Route] = {
+  "planner": Route(
+    model="deepseek-chat", max_tokens=4096, timeout=180, fallback="deepseek-reasoner"
+  ),
+  "coder": Route(model="deepseek-chat", max_tokens=8192, timeout=300, fallback="deepseek-reasoner"),
+  "debugger": Route(
+    model="deepseek-chat", max_tokens=8192, timeout=240, fallback="deepseek-reasoner"
+  ),
+  "optimizer": Route(
+    model="deepseek-chat", max_tokens=8192, timeout=300, fallback="deepseek-reasoner"
+  ),
+  "reviewer": Route(
+    model="deepseek-chat", max_tokens=2048, timeout=120, fallback="deepseek-reasoner"
+  ),
+  "fast": Route(model="deepseek-chat", max_tokens=1024, timeout=60, fallback="deepseek-reasoner"),
+}
+
+
+def _load_overrides() -> None:
+  extra = os.environ.get("LLM_MODELS", "").strip()
+  if extra:
+    for name, spec in json.loads(extra).items():
+      MODELS[name] = ModelSpec(name=name, **{"provider": name, **spec})
+
+  for name, route in list(ROUTES.items()):
+    prefix = f"LLM_ROUTE_{name.upper()}"
+    fallback = os.environ.get(f"{prefix}_FALLBACK", route.fallback)
+    ROUTES[name] = replace(
+      route,
+      model=os.environ.get(prefix, route.model),
+      max_tokens=int(os.environ.get(f"{prefix}_MAX_TOKENS", route.max_tokens)),
+      timeout=float(os.environ.get(f"{prefix}_TIMEOUT", route.timeout)),
+      fallback=fallback if fallback and fallback != "none" else None,
+    )
+
+
+_load_overrides()
+
+
+def _api_key(env_var: str) -> str:
+  key = os.environ.get(env_var, "").strip()
+  if not key:
+    raise RuntimeError(f"{env_var} is not set")
+  return key
+
+
+# Clients are built on first use so importing this module needs neither the provider SDKs
+# nor the API keys.
+
+
+def build_chat_model(spec: ModelSpec, max_tokens: int, timeout: float):
+  from langchain_openai.chat_models.base import BaseChatOpenAI
+
+  return BaseChatOpenAI(
+    base_url=spec.base_url,
+    model=spec.model,
+    api_key=_api_key(spec.api_key_env),
+    max_tokens=max_tokens,
+    timeout=timeout,
+    max_retries=0,
+    http_client=transport.http_client(),
+  )
+
+
+@lru_cache(maxsize=32)
+def _chat_model(model_name: str, max_tokens: int, timeout: float):
+  return build_chat_model(MODELS[model_name], max_tokens, timeout)
+
+
+# ---------------------------------------------------------------------------
+# Per-route latency stats
+# ---------------------------------------------------------------------------
+
+_STATS_WINDOW = 500
+_stats_lock = threading.Lock()
+_stats: dict[str, dict] = {}
+
+
+def _record(route: str, model_name: str, seconds: float, ok: bool, fallback: bool) -> None:
+  with _stats_lock:
+    entry = _stats.setdefault(
+      route,
+      {
+        "calls": 0,
+        "errors": 0,
+        "fallbacks": 0,
+        "models": {},
+        "latencies": deque(maxlen=_STATS_WINDOW),
+      },
+    )
+    entry["calls"] += 1
+    entry["errors"] += 0 if ok else 1
+    entry["fallbacks"] += 1 if fallback and ok else 0
+    per_model = entry["models"].setdefault(model_name, {"ok": 0, "errors": 0})
+    per_model["ok" if ok else "errors"] += 1
+    if ok:
+      entry["latencies"].append(seconds)
+
+
+def _quantile(values: list[float], q: float) -> float:
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def route_stats() -> dict:
+  """Latency percentiles (seconds), error and fallback counts per route."""
+  with _stats_lock:
+    snapshot = {
+      name: {**entry, "latencies": list(entry["latencies"])} for name, entry in _stats.items()
+    }
+  out = {}
+  for name, entry in snapshot.items():
+    lat = entry.pop("latencies")
+    route = ROUTES.get(name)
+    out[name] = {
+      **entry,
+      "model": route.model if route else None,
+      "fallback_model": route.fallback if route else None,
+      "p50_s": round(statistics.median(lat), 3) if lat else None,
+      "p95_s": round(_quantile(lat, 0.95), 3) if lat else None,
+      "p99_s": round(_quantile(lat, 0.99), 3) if lat else None,
+    }
+  return out
+
+
+# ---------------------------------------------------------------------------
+# Router
+# ---------------------------------------------------------------------------
+
+
+def _estimate_tokens(messages, max_tokens: int) -> int:
+  """Rough TPM reservation: ~4 chars per prompt token plus the completion cap."""
+  chars = sum(len(str(getattr(m, "content", m))) for m in messages)
+  return chars // 4 + max_tokens
+
+
+def _charge(model_name: str, messages, result) -> None:
+  """Charge the call to the job's budget, from usage metadata when the model reports it."""
+  if isinstance(result, dict) and "raw" in result:
+    # include_raw structured output: the message carries the usage
+    result = result["raw"] if result["raw"] is not None else result["parsed"]
+  usage = getattr(result, "usage_metadata", None) or {}
+  tokens_in = usage.get("input_tokens") or _estimate_tokens(messages, 0)
+  tokens_out = usage.get("output_tokens")
+  if tokens_out is None:
+    # Structured output returns the parsed object; size it from its serialized form
+    text = result.model_dump_json() if hasattr(result, "model_dump_json") else str(result)
+    tokens_out = len(text) // 4
+  spec = MODELS[model_name]
+  budget.charge(
+    tokens_in,
+    tokens_out,
+    (tokens_in * spec.input_price + tokens_out * spec.output_price) / 1e6,
+  )
+
+
+class RoutedLLM:
+  """Chat model bound to a route: primary model, then fallback on error or timeout.
+
+  Each model attempt goes through `transport.call`, which owns retries and hedging.
+  """
+
+  def __init__(self, route: str, structured: tuple | None = None):
+    if route not in ROUTES:
+      raise KeyError(f"Unknown LLM route: {route}")
+    self.route = route
+    self._structured = structured
+
+  def with_structured_output(self, schema, **kwargs) -> "RoutedLLM":
+    return RoutedLLM(self.route, (schema, kwargs))
+
+  def _runnable(self, model_name: str):
+    route = ROUTES[self.route]
+    model = _chat_model(model_name, route.max_tokens, route.timeout)
+    if self._structured:
+      schema, kwargs = self._structured
+      return model.with_structured_output(schema, **kwargs)
+    return model
+
+  def invoke(self, messages, **kwargs):
+    route = ROUTES[self.route]
+    candidates = [route.model, *([route.fallback] if route.fallback else [])]
+    last_exc: Exception | None = None
+    for i, model_name in enumerate(candidates):
+      start = time.perf_counter()
+      try:
+        runnable = self._runnable(model_name)
+        result = transport.call(
+          f"{self.route}/{model_name}",
+          lambda: runnable.invoke(messages, **kwargs),
+          timeout=route.timeout,
+          provider=MODELS[model_name].provider,
+          tokens=_estimate_tokens(messages, route.max_tokens),
+        )
+      except Exception as exc:
+        _record(self.route, model_name, time.perf_counter() - start, ok=False, fallback=i > 0)
+        print(f"[LLM] Route '{self.route}' failed on {model_name}: {exc!r}")
+        last_exc = exc
+        continue
+      _record(self.route, model_name, time.perf_counter() - start, ok=True, fallback=i > 0)
+      _charge(model_name, messages, result)
+      return result
+    raise last_exc
+
+
+def get_llm(route: str) -> RoutedLLM:
+  return RoutedLLM(route)
+
+
+def build_mistral_client():
+  from mistralai import Mistral
+
+  return Mistral(api_key=_api_key("MISTRAL_API_KEY"), client=transport.http_client())
+
+
+@lru_cache(maxsize=1)
+def get_mistral():
+  return build_mistral_client()
@@ -0,0 +1,254 @@
+"""Optional performance pass between a successful execution and the review.
+
+Generated implementations of matrix- and agent-based algorithms tend to loop over numpy
+arrays element by element, which is what pushes experiments towards the executor's
+timeout. When a passing run took at least OPTIMIZER_MIN_SECONDS, this node looks for
+loop-heavy functions (nested loops, loop-indexed array access), ranks them by the run's
+profile when one was recorded, and asks the LLM to vectorize the file holding the
+hottest one. The rewrite is executed like any other revision and kept only if it passes,
+reproduces the baseline metrics within tolerance and is actually faster.
+"""
+
+import ast
+import math
+import os
+import re
+from dataclasses import asdict, dataclass
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from agents import artifacts, executor
+from agents.coder import generate_code
+from prompts import OPTIMIZER_PROMPT
+from state import AgentState
+
+OPTIMIZER_ENABLED = os.environ.get("OPTIMIZER_ENABLED", "0") == "1"
+# Passing runs faster than this are left alone
+OPTIMIZER_MIN_SECONDS = float(os.environ.get("OPTIMIZER_MIN_SECONDS", "10"))
+OPTIMIZER_MIN_SPEEDUP = float(os.environ.get("OPTIMIZER_MIN_SPEEDUP", "1.2"))
+OPTIMIZER_RTOL = float(os.environ.get("OPTIMIZER_RTOL", "1e-3"))
+OPTIMIZER_ATOL = float(os.environ.get("OPTIMIZER_ATOL", "1e-8"))
+
+_MAX_HOT_PATHS = 5
+# Metrics that measure the run itself and are expected to change
+_TIMING_KEYS = re.compile(r"time|second|elapsed|duration|runtime|speed|throughput", re.IGNORECASE)
+
+
+@dataclass
+class HotPath:
+  path: str
+  function: str
+  line: int
+  loop_depth: int
+  indexed_access: bool
+  profile_pct: float | None = None
+
+
+class _LoopVisitor(ast.NodeVisitor):
+  """Deepest loop nesting in a function and whether loop variables index into arrays."""
+
+  def __init__(self):
+    self.depth = 0
+    self.max_depth = 0
+    self.loop_vars: set[str] = set()
+    self.indexed_access = False
+
+  def _loop(self, node, targets):
+    self.depth += 1
+    self.max_depth = max(self.max_depth, self.depth)
+    self.loop_vars |= targets
+    self.generic_visit(node)
+    self.depth -= 1
+
+  def visit_For(self, node):
+    targets = {n.id for n in ast.walk(node.target) if isinstance(n, ast.Name)}
+    self._loop(node, targets)
+
+  def visit_While(self, node):
+    self._loop(node, set())
+
+  def visit_comprehension(self, node):
+    self.loop_vars |= {n.id for n in ast.walk(node.target) if isinstance(n, ast.Name)}
+    self.generic_visit(node)
+
+  def visit_Subscript(self, node):
+    if self.depth and any(
+      isinstance(n, ast.Name) and n.id in self.loop_vars for n in ast.walk(node.slice)
+    ):
+      self.indexed_access = True
+    self.generic_visit(node)
+
+  # Nested functions are scanned on their own
+  def visit_FunctionDef(self, node):
+    pass
+
+  visit_AsyncFunctionDef = visit_FunctionDef
+
+
+def find_hot_paths(files: dict[str, str], profile: dict | None = None) -> list[HotPath]:
+  """Loop-heavy functions in *files*, hottest first.
+
+  With a profile from `run_result["profile"]`, functions are ranked by their share of the
+  sampled time and ones that barely ran are dropped; otherwise by loop depth.
+  """
+  shares: dict[tuple[str, str], float] = {}
+  for entry in (profile or {}).get("top", []):
+    path, _, name = entry["function"].rsplit(":", 2)
+    shares[(path, name)] = max(shares.get((path, name), 0.0), entry["cumulative_pct"])
+
+  hot = []
+  for path, source in files.items():
+    try:
+      tree = ast.parse(source)
+    except SyntaxError:
+      continue
+    for node in ast.walk(tree):
+      if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        continue
+      visitor = _LoopVisitor()
+      for statement in node.body:
+        visitor.visit(statement)
+      if visitor.max_depth < 2 and not (visitor.max_depth and visitor.indexed_access):
+        continue
+      hot.append(
+        HotPath(
+          path=path,
+          function=node.name,
+          line=node.lineno,
+          loop_depth=visitor.max_depth,
+          indexed_access=visitor.indexed_access,
+          profile_pct=shares.get((path, node.name)),
+        )
+      )
+
+  if shares:
+    hot = [h for h in hot if (h.profile_pct or 0.0) >= 5.0]
+    hot.sort(key=lambda h: h.profile_pct, reverse=True)
+  else:
+    hot.sort(key=lambda h: (h.loop_depth, h.indexed_access), reverse=True)
+  return hot[:_MAX_HOT_PATHS]
+
+
+def _numeric_leaves(value, prefix: str = "") -> dict[str, float]:
+  if isinstance(value, bool):
+    return {}
+  if isinstance(value, (int, float)):
+    return {prefix: float(value)}
+  if isinstance(value, dict):
+    items = value.items()
+  elif isinstance(value, list):
+    items = enumerate(value)
+  else:
+    return {}
+  leaves = {}
+  for key, item in items:
+    if isinstance(key, str) and _TIMING_KEYS.search(key):
+      continue
+    leaves.update(_numeric_leaves(item, f"{prefix}.{key}" if prefix else str(key)))
+  return leaves
+
+
+def compare_metrics(baseline: dict, candidate: dict) -> list[str]:
+  """Metrics where *candidate* departs from *baseline* beyond the tolerance."""
+  expected = _numeric_leaves(baseline)
+  actual = _numeric_leaves(candidate)
+  mismatches = []
+  for key, value in expected.items():
+    if key not in actual:
+      mismatches.append(f"{key}: missing")
+    elif not (
+      math.isclose(value, actual[key], rel_tol=OPTIMIZER_RTOL, abs_tol=OPTIMIZER_ATOL)
+      or (math.isnan(value) and math.isnan(actual[key]))
+    ):
+      mismatches.append(f"{key}: {value!r} -> {actual[key]!r}")
+  return mismatches
+
+
+def _hot_paths_text(hot: list[HotPath]) -> str:
+  lines = []
+  for h in hot:
+    details = [f"loop depth {h.loop_depth}"]
+    if h.indexed_access:
+      details.append("indexes arrays with loop variables")
+    if h.profile_pct is not None:
+      details.append(f"{h.profile_pct}% of the run")
+    lines.append(f"- {h.function} (line {h.line}): {', '.join(details)}")
+  return "\n".join(lines)
+
+
+def optimizer_agent(state: AgentState) -> AgentState:
+  run_result = state.get("run_result") or {}
+  baseline_seconds = run_result.get("run_seconds", 0.0)
+  if baseline_seconds < OPTIMIZER_MIN_SECONDS:
+    print(f"[Optimizer] Run took {baseline_seconds}s — nothing to optimize")
+    return state
+
+  files = {
+    "method.py": artifacts.get(state["generated_code"]),
+    **artifacts.get_files(state.get("generated_files") or {}),
+  }
+  hot = find_hot_paths(files, run_result.get("profile"))
+  report: dict = {"baseline_seconds": baseline_seconds, "hot_paths": [asdict(h) for h in hot]}
+  if not hot:
+    print("[Optimizer] No loop-heavy hot paths found")
+    return {**state, "run_result": {**run_result, "optimization": {**report, "kept": False}}}
+
+  target = hot[0].path
+  targeted = [h for h in hot if h.path == target]
+  report["target"] = target
+  print(f"[Optimizer] Vectorizing {target}: {[h.function for h in targeted]}")
+  try:
+    rewrite = generate_code(
+      "optimizer",
+      [
+        SystemMessage(content=OPTIMIZER_PROMPT),
+        HumanMessage(
+          content=f"File: {target}\n\n{files[target]}\n\n"
+          f"Hot paths to vectorize:\n{_hot_paths_text(targeted)}"
+        ),
+      ],
+    )
+  except Exception as exc:
+    print(f"[Optimizer] Rewrite request failed: {exc!r}")
+    report.update(kept=False, reason=f"rewrite failed: {exc!r}")
+    return {**state, "run_result": {**run_result, "optimization": report}}
+
+  rewritten = artifacts.put(rewrite)
+  candidate = (
+    {**state, "generated_code": rewritten}
+    if target == "method.py"
+    else {**state, "generated_files": {**state["generated_files"], target: rewritten}}
+  )
+  candidate = executor.executor_agent(candidate)
+  candidate_result = candidate["run_result"]
+  optimized_seconds = candidate_result.get("run_seconds", 0.0)
+  mismatches = compare_metrics(state["observed_metrics"], candidate["observed_metrics"])
+  speedup = round(baseline_seconds / optimized_seconds, 2) if optimized_seconds else None
+  report.update(
+    optimized_seconds=optimized_seconds,
+    speedup=speedup,
+    candidate_success=candidate["execution_success"],
+    metric_mismatches=mismatches[:10],
+  )
+
+  if not candidate["execution_success"]:
+    reason = "rewrite failed to run"
+  elif mismatches:
+    reason = f"{len(mismatches)} metric(s) outside tolerance"
+  elif speedup is None or speedup < OPTIMIZER_MIN_SPEEDUP:
+    reason = f"speedup {speedup}x below {OPTIMIZER_MIN_SPEEDUP}x"
+  else:
+    reason = ""
+  report.update(kept=not reason, reason=reason or None)
+
+  if reason:
+    print(f"[Optimizer] Keeping the original — {reason}")
+    return {**state, "run_result": {**run_result, "optimization": report}}
+  print(
+    f"[Optimizer] Kept vectorized {target} — {baseline_seconds}s -> {optimized_seconds}s ({speedup}x)"
+  )
+  return {
+    **candidate,
+    "run_result": {**candidate_result, "optimization": report},
+    "status": "optimized",
+  }
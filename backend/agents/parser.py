@@ -1,7 +1,11 @@
 import base64
+import hashlib
 import json
+import os
 
-from agents.llm import mistral_client
+from agents import transport
+from agents.llm import get_mistral
+from agents.retrieval import PAPERS_DIR, build_index
 from prompts import PARSER_PROMPT
 from state import AgentState
 
@@ -22,27 +26,57 @@ _ANNOTATION_SCHEMA = {
   },
 }
 
+OCR_TIMEOUT = float(os.environ.get("OCR_TIMEOUT", "300"))
+
+
 def parser_agent(state: AgentState) -> AgentState:
   pdf_path = state["pdf_path"]
   print(f"[Parser] Starting — pdf_path: {pdf_path}")
 
   with open(pdf_path, "rb") as f:
-    pdf_b64 = base64.b64encode(f.read()).decode()
-
-  ocr_response = mistral_client.ocr.process(
-    model="mistral-ocr-latest",
-    document={"type": "document_url", "document_url": f"data:application/pdf;base64,{pdf_b64}"},
-    include_image_base64=True,
-    document_annotation_format=_ANNOTATION_SCHEMA,
-    document_annotation_prompt=PARSER_PROMPT,
+    pdf_bytes = f.read()
+
+  # The same PDF (re-runs, duplicates in a batch) reuses its earlier OCR
+  paper_dir = PAPERS_DIR / hashlib.sha256(pdf_bytes).hexdigest()[:16]
+  sections_path = paper_dir / "sections.json"
+  index_path = paper_dir / "index.json"
+  if sections_path.exists() and index_path.exists():
+    sections = json.loads(sections_path.read_text())
+    print(f"[Parser] Done — reused OCR from {paper_dir}, sections: {list(sections.keys())}")
+    return {
+      **state,
+      "parsed_sections": sections,
+      "paper_index_path": str(index_path),
+      "status": "parsed",
+    }
+
+  pdf_b64 = base64.b64encode(pdf_bytes).decode()
+
+  ocr_response = transport.call(
+    "ocr",
+    lambda: get_mistral().ocr.process(
+      model="mistral-ocr-latest",
+      document={"type": "document_url", "document_url": f"data:application/pdf;base64,{pdf_b64}"},
+      include_image_base64=True,
+      document_annotation_format=_ANNOTATION_SCHEMA,
+      document_annotation_prompt=PARSER_PROMPT,
+    ),
+    timeout=OCR_TIMEOUT,
+    hedge=False,
+    provider="mistral",
   )
 
   annotation = ocr_response.document_annotation
   sections = json.loads(annotation) if isinstance(annotation, str) else annotation
 
+  # Keep every page (not just the methodology) reachable through a per-paper passage index
+  index_path = build_index(paper_dir, [page.markdown or "" for page in ocr_response.pages])
+  sections_path.write_text(json.dumps(sections))
+
   print(f"[Parser] Done — {len(ocr_response.pages)} page(s), sections: {list(sections.keys())}")
   return {
     **state,
     "parsed_sections": sections,
+    "paper_index_path": str(index_path),
     "status": "parsed",
   }
@@ -2,8 +2,9 @@ import json
 
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from agents.llm import llm
-from prompts import PLANNER_PROMPT
+from agents.coder import MULTI_FILE
+from agents.structured import invoke_structured
+from prompts import PLANNER_MODULES_PROMPT, PLANNER_PROMPT
 from schemas import PlannerOutput
 from state import AgentState
 
@@ -14,14 +15,18 @@ def planner_agent(state: AgentState) -> AgentState:
     f"[Planner] Starting — {len(sections)} section(s): {list(sections.keys())}, instructions: {str(state['user_instructions'])[:100]!r}"
   )
 
-  result = llm.with_structured_output(PlannerOutput).invoke(
+  result = invoke_structured(
+    "planner",
+    PlannerOutput,
     [
-      SystemMessage(content=PLANNER_PROMPT),
+      SystemMessage(content=PLANNER_PROMPT + (PLANNER_MODULES_PROMPT if MULTI_FILE else "")),
       HumanMessage(
         content=f"Paper sections:\n{json.dumps(sections, indent=2)}\n\nUser instructions:\n{state['user_instructions'] or 'None provided'}"
       ),
-    ]
+    ],
   )
+  if result is None:
+    raise RuntimeError("Planner output could not be parsed or repaired")
 
   plan = result.model_dump()
   if not plan.get("files"):
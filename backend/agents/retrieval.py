@@ -0,0 +1,145 @@
+"""Per-paper passage retrieval over the OCR pages.
+
+The parser persists each page's markdown under PAPERS_DIR/<pdf sha256>/pages and builds a
+chunked BM25 index next to it, so agents can pull the few passages relevant to the task
+at hand (a failing function, a missing feature, an equation reference) instead of the
+whole methodology.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+PAPERS_DIR = Path(os.environ.get("PAPERS_DIR", "/tmp/papers"))
+
+_CHUNK_CHARS = 900
+_CHUNK_OVERLAP = 150
+_K1 = 1.5
+_B = 0.75
+
+_STOPWORDS = frozenset(
+  """a an and are as at be by for from has have in into is it its of on or that the this to
+  was were which with we our their these those can using use used via than then also such
+  each all any not""".split()
+)
+_EQUATION_RE = re.compile(r"\b(?:eq(?:uation)?s?\.?)\s*\(?(\d+)\)?", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+
+def tokenize(text: str) -> list[str]:
+  # "Eq. (3)", "equation 3" -> "eq_3" so equation references match across phrasings
+  text = _EQUATION_RE.sub(lambda m: f" eq_{m.group(1)} ", text)
+  tokens = []
+  for token in _TOKEN_RE.findall(text.lower()):
+    if token in _STOPWORDS or len(token) < 2:
+      continue
+    tokens.append(token)
+    # Split snake_case identifiers from tracebacks into their words as well
+    if "_" in token and not token.startswith("eq_"):
+      tokens.extend(part for part in token.split("_") if len(part) > 1 and part not in _STOPWORDS)
+  return tokens
+
+
+def _chunk_page(text: str) -> list[str]:
+  paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+  chunks: list[str] = []
+  current = ""
+  for para in paragraphs:
+    if current and len(current) + len(para) > _CHUNK_CHARS:
+      chunks.append(current)
+      current = current[-_CHUNK_OVERLAP:] + "\n\n" + para
+    else:
+      current = f"{current}\n\n{para}" if current else para
+    while len(current) > 2 * _CHUNK_CHARS:
+      chunks.append(current[:_CHUNK_CHARS])
+      current = current[_CHUNK_CHARS - _CHUNK_OVERLAP :]
+  if current:
+    chunks.append(current)
+  return chunks
+
+
+def build_index(paper_dir: Path, pages: list[str]) -> Path:
+  """Write pages/NNN.md and index.json under *paper_dir*; returns the index path."""
+  pages_dir = paper_dir / "pages"
+  pages_dir.mkdir(parents=True, exist_ok=True)
+  chunks = []
+  for page_no, markdown in enumerate(pages):
+    (pages_dir / f"{page_no:03d}.md").write_text(markdown)
+    for text in _chunk_page(markdown):
+      chunks.append({"page": page_no, "text": text, "terms": Counter(tokenize(text))})
+
+  doc_freq: Counter = Counter()
+  for chunk in chunks:
+    doc_freq.update(chunk["terms"].keys())
+
+  index_path = paper_dir / "index.json"
+  index_path.write_text(
+    json.dumps(
+      {
+        "chunks": [
+          {"page": c["page"], "text": c["text"], "terms": dict(c["terms"])} for c in chunks
+        ],
+        "doc_freq": dict(doc_freq),
+        "avg_len": sum(sum(c["terms"].values()) for c in chunks) / max(1, len(chunks)),
+      }
+    )
+  )
+  return index_path
+
+
+def bm25_scores(
+  query_terms: set[str], docs: list[dict], doc_freq: dict, avg_len: float
+) -> list[float]:
+  """Okapi BM25 score of every term-count dict in *docs* against *query_terms*."""
+  n = len(docs)
+  scores = []
+  for terms in docs:
+    length = sum(terms.values())
+    score = 0.0
+    for term in query_terms:
+      tf = terms.get(term)
+      if not tf:
+        continue
+      df = doc_freq.get(term, 0)
+      idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+      score += idf * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length / (avg_len or 1)))
+    scores.append(score)
+  return scores
+
+
+@lru_cache(maxsize=16)
+def _load(index_path: str) -> dict:
+  return json.loads(Path(index_path).read_text())
+
+
+def retrieve(index_path: str, query: str, k: int = 4, max_chars: int = 3000) -> list[dict]:
+  """Top-*k* BM25 passages for *query*, capped at *max_chars* of text in total."""
+  if not index_path or not Path(index_path).exists():
+    return []
+  index = _load(index_path)
+  chunks = index["chunks"]
+  n = len(chunks)
+  if not n:
+    return []
+  scores = bm25_scores(
+    set(tokenize(query)), [c["terms"] for c in chunks], index["doc_freq"], index["avg_len"]
+  )
+  scored = [(score, i) for i, score in enumerate(scores) if score > 0]
+
+  passages = []
+  used = 0
+  for score, i in sorted(scored, reverse=True)[:k]:
+    text = chunks[i]["text"]
+    if used + len(text) > max_chars and passages:
+      break
+    passages.append({"page": chunks[i]["page"], "score": round(score, 3), "text": text})
+    used += len(text)
+  return passages
+
+
+def format_passages(passages: list[dict]) -> str:
+  return "\n\n".join(f"[page {p['page'] + 1}]\n{p['text']}" for p in passages)
@@ -1,38 +1,122 @@
+import difflib
+import json
+import os
+
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from agents.llm import llm
-from prompts import REVIEWER_PROMPT
+from agents import artifacts, library
+from agents.structured import invoke_structured
+from prompts import INCREMENTAL_REVIEWER_PROMPT, REVIEWER_PROMPT
 from schemas import ReviewerOutput
 from state import AgentState
 
+# Re-review only the change against the previous verdict instead of the whole implementation
+REVIEWER_INCREMENTAL = os.environ.get("REVIEWER_INCREMENTAL", "1") == "1"
+# A diff touching more than this fraction of the code lines gets a full review instead
+REVIEWER_MAX_DIFF_RATIO = float(os.environ.get("REVIEWER_MAX_DIFF_RATIO", "0.6"))
+
+_OUTPUT_TAIL = 3000
 
-def reviewer_agent(state: AgentState) -> AgentState:
-  print(
-    f"[Reviewer] Starting — execution_success={state['execution_success']}, revision_count={state['revision_count']}"
-  )
 
-  result = llm.with_structured_output(ReviewerOutput).invoke(
-    [
-      SystemMessage(content=REVIEWER_PROMPT),
-      HumanMessage(
-        content=f"""Methodology:
+def _code_snapshot(state: AgentState) -> dict:
+  """Handles of every generated file, method.py included, as the reviewer saw them."""
+  return {"method.py": state["generated_code"], **(state.get("generated_files") or {})}
+
+
+def _code_diff(previous: dict, current: dict) -> tuple[str, float]:
+  """Unified diff between two snapshots and the fraction of code lines it touches."""
+  chunks = []
+  changed = 0
+  total = 0
+  for path in sorted(previous.keys() | current.keys()):
+    if previous.get(path) == current.get(path):
+      # An unchanged line counts once on each side, like a line the diff removes and re-adds
+      total += 2 * (artifacts.get(current[path]).count("\n") + 1)
+      continue
+    old = artifacts.get(previous.get(path, "")).splitlines(keepends=True)
+    new = artifacts.get(current.get(path, "")).splitlines(keepends=True)
+    total += len(old) + len(new)
+    lines = list(difflib.unified_diff(old, new, f"a/{path}", f"b/{path}", n=3))
+    changed += sum(1 for line in lines if line[:1] in "+-" and not line.startswith(("+++", "---")))
+    chunks.append("".join(line if line.endswith("\n") else line + "\n" for line in lines))
+  return "".join(chunks), changed / max(total, 1)
+
+
+def _full_review(state: AgentState) -> list:
+  return [
+    SystemMessage(content=REVIEWER_PROMPT),
+    HumanMessage(
+      content=f"""Methodology:
 {state["parsed_sections"].get("methodology", "")}
 
 Generated code:
-{state["generated_code"]}
+{artifacts.get(state["generated_code"])}
+
+Execution success: {state["execution_success"]}
+Execution output: {artifacts.get(state["execution_output"])}
+Observed metrics: {state.get("observed_metrics", {})}"""
+    ),
+  ]
+
+
+def _incremental_review(state: AgentState, diff: str) -> list:
+  previous = state["review_feedback"]
+  output = artifacts.get(state["execution_output"])[-_OUTPUT_TAIL:]
+  return [
+    SystemMessage(content=INCREMENTAL_REVIEWER_PROMPT),
+    HumanMessage(
+      content=f"""Previous review:
+{json.dumps(previous, indent=2)}
+
+Code changes since that review:
+{diff or "(no changes)"}
 
 Execution success: {state["execution_success"]}
-Execution output: {state["execution_output"]}
+Execution output (tail): {output}
 Observed metrics: {state.get("observed_metrics", {})}"""
-      ),
-    ]
+    ),
+  ]
+
+
+def reviewer_agent(state: AgentState) -> AgentState:
+  print(
+    f"[Reviewer] Starting — execution_success={state['execution_success']}, revision_count={state['revision_count']}"
   )
 
-  feedback = result.model_dump()
+  snapshot = _code_snapshot(state)
+  previous = state.get("reviewed_files") or {}
+  messages = None
+  route = "reviewer"
+  if REVIEWER_INCREMENTAL and previous and state.get("review_feedback"):
+    diff, ratio = _code_diff(previous, snapshot)
+    if ratio <= REVIEWER_MAX_DIFF_RATIO:
+      print(f"[Reviewer] Incremental review — diff touches {ratio:.0%} of the code")
+      messages = _incremental_review(state, diff)
+      # Re-checking a verdict against a diff is a small classification step
+      route = "fast"
+    else:
+      print(f"[Reviewer] Diff touches {ratio:.0%} of the code — falling back to a full review")
+  if messages is None:
+    messages = _full_review(state)
+  print(f"[Reviewer] Prompt size: {sum(len(m.content) for m in messages)} chars")
+
+  result = invoke_structured(route, ReviewerOutput, messages)
+  if result is None:
+    # Unusable review: judge by the run alone rather than failing the job
+    feedback = {
+      "verdict": "complete" if state["execution_success"] else "incomplete",
+      "summary": "The review could not be parsed; verdict based on the execution result.",
+      "missing": [],
+      "suggestions": [],
+    }
+  else:
+    feedback = result.model_dump()
   print(f"[Reviewer] Done — verdict: {feedback['verdict']}")
+  library.record_run(state, verdict=feedback["verdict"])
   return {
     **state,
     "review_feedback": feedback,
+    "reviewed_files": snapshot,
     "review_iteration": state.get("review_iteration", 0) + 1,
     "status": "review complete",
   }
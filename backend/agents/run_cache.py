@@ -0,0 +1,133 @@
+"""Cache of execution results keyed by everything that determines a run.
+
+Debugger patches and reviewer-driven recodes sometimes reproduce a repo byte for byte, and
+retried jobs re-submit code that already ran. The key hashes the full set of repo files
+(code, rendered configs, tests), the executor's harness settings and the resolved package
+versions, so a hit is a run whose outcome cannot differ. A hit returns the stored logs,
+metrics and `run_result`; the executor hard-links the original run's repo directory into
+the new run's and writes its report again for the current job.
+
+Install failures and timeouts are not stored; they depend on the network and the host's
+load rather than on the code. Entries are bounded by count and size, least recently used
+first, like the implementation library.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+EXEC_CACHE_DIR = Path(os.environ.get("EXEC_CACHE_DIR", "/tmp/exec_cache"))
+EXEC_CACHE_ENABLED = os.environ.get("EXEC_CACHE_ENABLED", "1") == "1"
+EXEC_CACHE_MAX_ENTRIES = int(os.environ.get("EXEC_CACHE_MAX_ENTRIES", "500"))
+EXEC_CACHE_MAX_MB = float(os.environ.get("EXEC_CACHE_MAX_MB", "200"))
+
+_lock = threading.Lock()
+_lookups = 0
+_hits = 0
+_stores = 0
+
+
+def _index_path() -> Path:
+  return EXEC_CACHE_DIR / "index.json"
+
+
+def _entry_path(key: str) -> Path:
+  return EXEC_CACHE_DIR / "entries" / f"{key}.json"
+
+
+def _write_json(path: Path, value) -> None:
+  path.parent.mkdir(parents=True, exist_ok=True)
+  tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+  tmp.write_text(json.dumps(value))
+  tmp.replace(path)
+
+
+def _read_index() -> dict:
+  try:
+    return json.loads(_index_path().read_text())
+  except (FileNotFoundError, json.JSONDecodeError):
+    return {}
+
+
+def cache_key(files: dict[str, str], packages: dict[str, str], harness: str) -> str:
+  digest = hashlib.sha256()
+  for path in sorted(files):
+    digest.update(f"{path}\0{len(files[path])}\0".encode())
+    digest.update(files[path].encode())
+  digest.update(json.dumps(sorted(packages.items())).encode())
+  digest.update(harness.encode())
+  return digest.hexdigest()
+
+
+def lookup(key: str) -> dict | None:
+  """Stored executor fields for *key*, or None (also when the original repo is gone)."""
+  global _lookups, _hits
+  if not EXEC_CACHE_ENABLED:
+    return None
+  with _lock:
+    _lookups += 1
+    index = _read_index()
+    if key not in index:
+      return None
+    try:
+      entry = json.loads(_entry_path(key).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+      entry = None
+    if entry is None or not Path(entry["output_repo_path"]).is_dir():
+      del index[key]
+      _entry_path(key).unlink(missing_ok=True)
+      _write_json(_index_path(), index)
+      return None
+    _hits += 1
+    index[key]["last_used"] = time.time()
+    index[key]["hits"] = index[key].get("hits", 0) + 1
+    _write_json(_index_path(), index)
+  return entry
+
+
+def _evict(index: dict) -> None:
+  max_bytes = EXEC_CACHE_MAX_MB * 2**20
+  by_age = sorted(index.values(), key=lambda e: e["last_used"])
+  total = sum(e["size"] for e in by_age)
+  while by_age and (len(index) > EXEC_CACHE_MAX_ENTRIES or total > max_bytes):
+    oldest = by_age.pop(0)
+    del index[oldest["key"]]
+    total -= oldest["size"]
+    _entry_path(oldest["key"]).unlink(missing_ok=True)
+
+
+def store(key: str, fields: dict) -> None:
+  """Store the executor's resolved output fields (plain strings, no artifact handles)."""
+  global _stores
+  if not EXEC_CACHE_ENABLED:
+    return
+  with _lock:
+    _write_json(_entry_path(key), fields)
+    index = _read_index()
+    now = time.time()
+    index[key] = {
+      "key": key,
+      "size": _entry_path(key).stat().st_size,
+      "created": now,
+      "last_used": now,
+      "hits": 0,
+    }
+    _evict(index)
+    _write_json(_index_path(), index)
+    _stores += 1
+
+
+def run_cache_stats() -> dict:
+  with _lock:
+    index = _read_index()
+  return {
+    "enabled": EXEC_CACHE_ENABLED,
+    "entries": len(index),
+    "size_mb": round(sum(e["size"] for e in index.values()) / 2**20, 3),
+    "lookups": _lookups,
+    "hits": _hits,
+    "stores": _stores,
+  }
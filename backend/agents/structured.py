@@ -0,0 +1,349 @@
+"""Local repair of structured LLM outputs.
+
+`with_structured_output` fails the whole call when the model's reply doesn't parse or
+validate: a fenced or prose-wrapped JSON object, a trailing comma, raw newlines inside a
+string, a reply cut off at the token limit, "Patch" instead of "patch", a bulleted string
+where a list was expected. Each of those used to cost a blind recode in the debugger and
+a crash in the planner and reviewer.
+
+`invoke_structured` asks for the raw message alongside the parsed object. When parsing
+fails it extracts the JSON locally (fences stripped, first balanced object, lenient
+decoding, truncated objects closed), coerces it field by field against the Pydantic
+schema and keeps whatever validates. Only if required fields are still missing does it
+make one re-ask for just those fields: on the `fast` route when they are all small scalars
+(enums, numbers, flags), otherwise on the caller's route, since a missing free-text field
+can be a whole patched file that the `fast` token cap would cut off again.
+"""
+
+import ast
+import json
+import os
+import re
+import threading
+import typing
+
+from pydantic import BaseModel, ValidationError
+
+from agents.llm import get_llm
+
+STRUCTURED_REPAIR = os.environ.get("STRUCTURED_REPAIR", "1") == "1"
+STRUCTURED_REASK = os.environ.get("STRUCTURED_REASK", "1") == "1"
+# Route for re-asks that only fill small scalar fields
+STRUCTURED_REASK_ROUTE = os.environ.get("STRUCTURED_REASK_ROUTE", "fast")
+
+# Raw reply echoed back in a re-ask
+_REASK_ECHO_CHARS = 6000
+
+_FENCE = re.compile(r"```(?:json|JSON|python)?\s*([\s\S]*?)```")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_DANGLING_KEY = re.compile(r',?\s*"(?:[^"\\]|\\.)*"\s*:\s*$')
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+_lock = threading.Lock()
+_counts = {"calls": 0, "parsed": 0, "repaired": 0, "reasked": 0, "failed": 0}
+
+
+def _count(outcome: str) -> None:
+  with _lock:
+    _counts[outcome] += 1
+
+
+def structured_stats() -> dict:
+  with _lock:
+    return dict(_counts)
+
+
+# ---------------------------------------------------------------------------
+# Tolerant JSON extraction
+# ---------------------------------------------------------------------------
+
+
+def _balanced_object(text: str) -> str | None:
+  """The first `{...}` in *text*, or its unterminated tail when the reply was cut off."""
+  start = text.find("{")
+  if start < 0:
+    return None
+  depth, in_string, escaped = 0, False, False
+  for i in range(start, len(text)):
+    ch = text[i]
+    if in_string:
+      if escaped:
+        escaped = False
+      elif ch == "\\":
+        escaped = True
+      elif ch == '"':
+        in_string = False
+    elif ch == '"':
+      in_string = True
+    elif ch in "{[":
+      depth += 1
+    elif ch in "}]":
+      depth -= 1
+      if depth == 0:
+        return text[start : i + 1]
+  return text[start:]
+
+
+def _close_truncated(text: str) -> str:
+  """Close the arrays and objects of a JSON document cut off mid-way.
+
+  A string cut off mid-way is dropped with its key rather than closed: half a patch must
+  not pass for a whole one, and a missing field can still be re-asked.
+  """
+  stack, in_string, escaped, string_start = [], False, False, 0
+  for i, ch in enumerate(text):
+    if in_string:
+      if escaped:
+        escaped = False
+      elif ch == "\\":
+        escaped = True
+      elif ch == '"':
+        in_string = False
+    elif ch == '"':
+      in_string, string_start = True, i
+    elif ch in "{[":
+      stack.append("}" if ch == "{" else "]")
+    elif ch in "}]" and stack:
+      stack.pop()
+  if in_string:
+    text = text[:string_start]
+  text = _DANGLING_KEY.sub("", text).rstrip().rstrip(",")
+  return text + "".join(reversed(stack))
+
+
+def _loads(text: str):
+  for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+    try:
+      # strict=False accepts raw newlines inside strings, e.g. code in a patch
+      return json.loads(candidate, strict=False)
+    except json.JSONDecodeError:
+      pass
+  try:
+    # Python-style dicts: single quotes, True/False/None
+    return ast.literal_eval(text)
+  except (ValueError, SyntaxError, MemoryError, RecursionError):
+    return None
+
+
+def extract_json(text: str) -> dict | None:
+  """Best-effort JSON object from a model reply: fenced, wrapped in prose or truncated."""
+  if not text:
+    return None
+  candidates = [m.group(1) for m in _FENCE.finditer(text)] + [text]
+  for candidate in candidates:
+    body = _balanced_object(candidate)
+    if body is None:
+      continue
+    for attempt in (body, _close_truncated(body)):
+      value = _loads(attempt)
+      if isinstance(value, dict):
+        return value
+  return None
+
+
+def _raw_payload(raw) -> dict | None:
+  """The object the model meant to return, from its tool call or its text."""
+  if raw is None:
+    return None
+  for call in getattr(raw, "tool_calls", None) or []:
+    if isinstance(call.get("args"), dict) and call["args"]:
+      return call["args"]
+  for call in getattr(raw, "invalid_tool_calls", None) or []:
+    value = extract_json(call.get("args") or "")
+    if value is not None:
+      return value
+  parsed = (getattr(raw, "additional_kwargs", None) or {}).get("parsed")
+  if isinstance(parsed, dict):
+    return parsed
+  content = getattr(raw, "content", raw)
+  return extract_json(content if isinstance(content, str) else json.dumps(content))
+
+
+def _raw_text(raw) -> str:
+  for call in getattr(raw, "invalid_tool_calls", None) or []:
+    if call.get("args"):
+      return str(call["args"])
+  for call in getattr(raw, "tool_calls", None) or []:
+    return json.dumps(call.get("args"))
+  content = getattr(raw, "content", "")
+  return content if isinstance(content, str) else json.dumps(content)
+
+
+# ---------------------------------------------------------------------------
+# Lenient schema coercion
+# ---------------------------------------------------------------------------
+
+
+def _normalize_key(key) -> str:
+  return re.sub(r"[^a-z0-9]+", "_", str(key).strip().lower()).strip("_")
+
+
+def _coerce(annotation, value):
+  """*value* converted to *annotation*; raises ValueError when it can't be."""
+  origin = typing.get_origin(annotation)
+  if origin is typing.Literal:
+    options = typing.get_args(annotation)
+    text = str(value).strip().strip("'\"`").lower()
+    for option in options:
+      if text == str(option).lower():
+        return option
+    # e.g. "Patch the loop bound" -> "patch"
+    matches = [o for o in options if re.search(rf"\b{re.escape(str(o).lower())}\b", text)]
+    if len(matches) == 1:
+      return matches[0]
+    raise ValueError(f"{value!r} is not one of {options}")
+  if origin is list:
+    (item_type,) = typing.get_args(annotation) or (typing.Any,)
+    if isinstance(value, str):
+      value = [_BULLET.sub("", line) for line in value.splitlines()]
+      value = [line.strip() for line in value if line.strip()]
+    elif not isinstance(value, list):
+      value = [value]
+    items = []
+    for item in value:
+      try:
+        items.append(_coerce(item_type, item))
+      except (ValueError, TypeError):
+        # Partial recovery: keep the items that make sense
+        continue
+    return items
+  if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+    if isinstance(value, str):
+      value = extract_json(value)
+    model, missing = coerce_model(annotation, value)
+    if model is None:
+      raise ValueError(f"{annotation.__name__} missing {missing}")
+    return model
+  if annotation is str:
+    if value is None:
+      raise ValueError("null")
+    if isinstance(value, list):
+      return "\n".join(str(v) for v in value)
+    return json.dumps(value) if isinstance(value, dict) else str(value)
+  return value
+
+
+def coerce_model(schema: type[BaseModel], data) -> tuple[BaseModel | None, list[str]]:
+  """Validate *data* against *schema* field by field.
+
+  Returns the model, or None with the required fields that couldn't be recovered.
+  """
+  if not isinstance(data, dict):
+    return None, [n for n, f in schema.model_fields.items() if f.is_required()]
+  fields = schema.model_fields
+  by_key = {_normalize_key(k): v for k, v in data.items()}
+  if not set(by_key) & set(fields) and len(data) == 1:
+    # {"DebuggerOutput": {...}}, {"arguments": {...}} and similar wrappers
+    (inner,) = data.values()
+    if isinstance(inner, dict):
+      return coerce_model(schema, inner)
+
+  values, missing = {}, []
+  for name, field in fields.items():
+    if by_key.get(name) is not None:
+      try:
+        values[name] = _coerce(field.annotation, by_key[name])
+        continue
+      except (ValueError, TypeError):
+        pass
+    if field.is_required():
+      missing.append(name)
+  if missing:
+    return None, missing
+  try:
+    return schema(**values), []
+  except ValidationError as exc:
+    return None, sorted({str(err["loc"][0]) for err in exc.errors() if err["loc"]})
+
+
+def _with_list_defaults(schema: type[BaseModel], data: dict, missing: list[str]) -> dict:
+  """Empty lists for missing list fields: better a partial result than none."""
+  data = dict(data)
+  for name in missing:
+    if typing.get_origin(schema.model_fields[name].annotation) is list:
+      data[name] = []
+  return data
+
+
+def _is_scalar(annotation) -> bool:
+  return typing.get_origin(annotation) is typing.Literal or annotation in (bool, int, float)
+
+
+def _reask_route(route: str, schema: type[BaseModel], missing: list[str]) -> str:
+  if all(_is_scalar(schema.model_fields[name].annotation) for name in missing):
+    return STRUCTURED_REASK_ROUTE
+  return route
+
+
+def _field_spec(schema: type[BaseModel], names: list[str]) -> str:
+  lines = []
+  for name in names:
+    field = schema.model_fields[name]
+    kind = getattr(field.annotation, "__name__", None) or str(field.annotation)
+    lines.append(f'- "{name}" ({kind}): {field.description or ""}'.rstrip(": "))
+  return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+
+def invoke_structured(route: str, schema: type[BaseModel], messages: list) -> BaseModel | None:
+  """Structured call on *route* with local repair; None if the output can't be recovered.
+
+  Provider errors propagate as before; only malformed output is handled here.
+  """
+  # Imported here so that importing main (for /stats) doesn't load LangChain
+  from langchain_core.messages import AIMessage, HumanMessage
+
+  _count("calls")
+  if not STRUCTURED_REPAIR:
+    return get_llm(route).with_structured_output(schema).invoke(messages)
+
+  result = get_llm(route).with_structured_output(schema, include_raw=True).invoke(messages)
+  if result.get("parsed") is not None:
+    _count("parsed")
+    return result["parsed"]
+
+  tag = f"[Structured] {schema.__name__}"
+  raw = result.get("raw")
+  print(f"{tag}: output didn't validate ({result.get('parsing_error')!r}) — repairing locally")
+  data = _raw_payload(raw) or {}
+  model, missing = coerce_model(schema, data)
+  if model is not None:
+    _count("repaired")
+    print(f"{tag}: repaired locally")
+    return model
+
+  if STRUCTURED_REASK and missing:
+    _count("reasked")
+    print(f"{tag}: re-asking for {missing}")
+    reask = [
+      *messages,
+      AIMessage(content=_raw_text(raw)[:_REASK_ECHO_CHARS]),
+      HumanMessage(
+        content="Your reply was missing or had invalid values for these fields:\n"
+        f"{_field_spec(schema, missing)}\n\n"
+        "Reply with only a JSON object containing exactly these keys."
+      ),
+    ]
+    try:
+      response = get_llm(_reask_route(route, schema, missing)).invoke(reask)
+      extra = extract_json(response.content if isinstance(response.content, str) else "")
+    except Exception as exc:
+      print(f"{tag}: re-ask failed: {exc!r}")
+      extra = None
+    if extra:
+      data = {**data, **extra}
+      model, missing = coerce_model(schema, data)
+
+  if model is None and missing:
+    model, _ = coerce_model(schema, _with_list_defaults(schema, data, missing))
+  if model is not None:
+    _count("repaired")
+    print(f"{tag}: recovered")
+    return model
+  _count("failed")
+  print(f"{tag}: unrecoverable — missing {missing}")
+  return None
@@ -0,0 +1,292 @@
+"""Parameter sweeps over a generated repo's configs.
+
+This file is self-contained (stdlib + PyYAML, matplotlib if installed): the executor copies
+it verbatim into every generated repo as `scripts/sweep.py`, where `scripts/eval.sh` runs
+it, and runs it from there when `EXECUTOR_SWEEP=1`. A spec looks like:
+
+  base: configs/default.yaml
+  mode: grid                 # or "random"
+  samples: 8                 # random mode only
+  seed: 0
+  params:
+    step_size: [0.025, 0.05, 0.1]
+    n_agents: [3, 5]
+    max_iter: {low: 50, high: 400, log: true, int: true}   # random mode only
+  configs: [configs/ablation.yaml]                        # extra runs, used as-is
+
+Every expanded config runs `run_experiment.py` in its own process, `--workers` at a time,
+each under CPU-time and address-space limits. Per-run configs, metrics and series go to
+`<out>/run_NNN/`; the aggregate goes to `<out>/results.csv`, `summary.json`, `summary.md`
+and, with matplotlib, one plot per swept parameter and metric under `<out>/plots/`.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import yaml
+
+_MAX_PLOTTED_METRICS = 4
+
+
+def expand(spec: dict) -> list[dict]:
+  """Parameter overrides for every run the spec describes."""
+  params = spec.get("params") or {}
+  mode = spec.get("mode", "grid")
+  if mode == "grid":
+    for name, values in params.items():
+      if not isinstance(values, list):
+        raise ValueError(f"grid sweeps need a list of values for {name!r}")
+    names = list(params)
+    return [dict(zip(names, combo)) for combo in itertools.product(*params.values())]
+  if mode != "random":
+    raise ValueError(f"unknown sweep mode {mode!r}")
+
+  rng = random.Random(spec.get("seed", 0))
+  runs = []
+  for _ in range(int(spec.get("samples", 8))):
+    overrides = {}
+    for name, values in params.items():
+      if isinstance(values, list):
+        overrides[name] = rng.choice(values)
+        continue
+      low, high = float(values["low"]), float(values["high"])
+      if values.get("log"):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+      else:
+        value = rng.uniform(low, high)
+      overrides[name] = int(round(value)) if values.get("int") else value
+    runs.append(overrides)
+  return runs
+
+
+# Runs start from worker threads, where preexec_fn can deadlock the child; this shim sets
+# the limits in the new interpreter and then execs the real command in place
+_LIMITS_SHIM = """\
+import os, resource, sys
+memory_mb, cpu_seconds = int(sys.argv[1]), int(sys.argv[2])
+if cpu_seconds:
+  resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+if memory_mb:
+  resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 2**20, memory_mb * 2**20))
+os.execv(sys.argv[3], sys.argv[3:])
+"""
+
+
+def _limited(cmd: list[str], memory_mb: int, cpu_seconds: int) -> list[str]:
+  """*cmd* wrapped so that it runs under CPU-time and address-space limits."""
+  return [sys.executable, "-c", _LIMITS_SHIM, str(memory_mb or 0), str(cpu_seconds or 0), *cmd]
+
+
+def _run_one(index: int, config: dict, overrides: dict, label: str, args) -> dict:
+  run_dir = args.out / f"run_{index:03d}"
+  run_dir.mkdir(parents=True, exist_ok=True)
+  config_path = run_dir / "config.yaml"
+  config_path.write_text(yaml.safe_dump(config, sort_keys=True))
+  metrics_path = run_dir / "metrics.json"
+  env = {
+    **os.environ,
+    "DESCARTES_SERIES_PATH": str(run_dir / "series.jsonl"),
+    # Runs share the machine; one BLAS thread each avoids oversubscription
+    "OMP_NUM_THREADS": "1",
+    "OPENBLAS_NUM_THREADS": "1",
+    "MKL_NUM_THREADS": "1",
+  }
+  cmd = [
+    sys.executable,
+    "run_experiment.py",
+    "--config",
+    str(config_path),
+    "--output",
+    str(metrics_path),
+  ]
+  cmd = _limited(cmd, args.memory_mb, args.timeout)
+  row = {"run": index, "label": label, "params": overrides, "status": "ok", "error": ""}
+  started = time.monotonic()
+  try:
+    result = subprocess.run(
+      cmd,
+      capture_output=True,
+      text=True,
+      timeout=args.timeout,
+      env=env,
+    )
+    if result.returncode != 0:
+      row.update(status="failed", error=(result.stderr.strip().splitlines() or [""])[-1][:300])
+  except subprocess.TimeoutExpired:
+    row.update(status="timeout", error=f"timed out after {args.timeout}s")
+  row["seconds"] = round(time.monotonic() - started, 3)
+  try:
+    metrics = json.loads(metrics_path.read_text())
+  except (FileNotFoundError, json.JSONDecodeError):
+    metrics = {}
+  row["metrics"] = {
+    k: v for k, v in metrics.items() if isinstance(v, (int, float)) and not isinstance(v, bool)
+  }
+  print(f"[sweep] run {index:03d} {row['status']} in {row['seconds']}s {overrides or label}")
+  return row
+
+
+def _best(rows: list[dict], objective: str | None, maximize: bool) -> dict | None:
+  scored = [r for r in rows if r["status"] == "ok" and objective in r["metrics"]]
+  scored = [r for r in scored if math.isfinite(r["metrics"][objective])]
+  if not scored:
+    return None
+  pick = max if maximize else min
+  return pick(scored, key=lambda r: r["metrics"][objective])
+
+
+def _write_table(rows: list[dict], out: Path) -> tuple[list[str], list[str]]:
+  param_names = sorted({k for r in rows for k in r["params"]})
+  metric_names = sorted({k for r in rows for k in r["metrics"]})
+  with open(out / "results.csv", "w", newline="") as f:
+    writer = csv.writer(f)
+    writer.writerow(["run", "label", "status", "seconds", *param_names, *metric_names])
+    for r in rows:
+      writer.writerow(
+        [
+          r["run"],
+          r["label"],
+          r["status"],
+          r["seconds"],
+          *(r["params"].get(p, "") for p in param_names),
+          *(r["metrics"].get(m, "") for m in metric_names),
+        ]
+      )
+  return param_names, metric_names
+
+
+def _write_markdown(rows, param_names, metric_names, best, objective, out: Path) -> None:
+  shown = metric_names[:6]
+  header = ["run", *param_names, *shown, "status", "s"]
+  lines = [
+    "# Sweep Summary",
+    "",
+    f"- Runs: {len(rows)} ({sum(r['status'] == 'ok' for r in rows)} ok)",
+  ]
+  if best is not None:
+    lines.append(f"- Best by `{objective}`: run {best['run']} {best['params'] or best['label']}")
+  lines += ["", "| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+  for r in rows:
+    cells = [
+      f"{r['run']} ({r['label']})" if r["label"] else str(r["run"]),
+      *(str(r["params"].get(p, "")) for p in param_names),
+      *(f"{r['metrics'][m]:.4g}" if m in r["metrics"] else "" for m in shown),
+      r["status"],
+      str(r["seconds"]),
+    ]
+    lines.append("| " + " | ".join(cells) + " |")
+  (out / "summary.md").write_text("\n".join(lines) + "\n")
+
+
+def _write_plots(rows, param_names, metric_names, out: Path) -> list[str]:
+  """Mean of each metric against each swept parameter (other parameters averaged out)."""
+  try:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+  except ImportError:
+    return []
+  ok = [r for r in rows if r["status"] == "ok" and r["params"]]
+  plots = []
+  (out / "plots").mkdir(exist_ok=True)
+  for param in param_names:
+    values = {r["params"][param] for r in ok if param in r["params"]}
+    try:
+      values = sorted(values)
+    except TypeError:
+      values = sorted(values, key=str)
+    if len(values) < 2:
+      continue
+    for metric in metric_names[:_MAX_PLOTTED_METRICS]:
+      means = []
+      for value in values:
+        points = [
+          r["metrics"][metric]
+          for r in ok
+          if r["params"].get(param) == value and metric in r["metrics"]
+        ]
+        means.append(sum(points) / len(points) if points else float("nan"))
+      fig, ax = plt.subplots(figsize=(4.5, 3.2))
+      ax.plot([str(v) for v in values], means, marker="o")
+      ax.set_xlabel(param)
+      ax.set_ylabel(metric)
+      ax.set_title(f"{metric} vs {param}")
+      fig.tight_layout()
+      path = out / "plots" / f"{metric}_vs_{param}.png"
+      fig.savefig(path, dpi=110)
+      plt.close(fig)
+      plots.append(str(path))
+  return plots
+
+
+def run_sweep(args) -> dict:
+  spec = yaml.safe_load(Path(args.spec).read_text()) or {}
+  base = yaml.safe_load(Path(spec.get("base", "configs/default.yaml")).read_text()) or {}
+  jobs = [({**base, **overrides}, overrides, "") for overrides in expand(spec)]
+  for path in spec.get("configs") or []:
+    jobs.append((yaml.safe_load(Path(path).read_text()) or {}, {}, path))
+  if args.max_runs:
+    jobs = jobs[: args.max_runs]
+
+  args.out.mkdir(parents=True, exist_ok=True)
+  print(f"[sweep] {len(jobs)} run(s), {args.workers} at a time")
+  started = time.monotonic()
+  with ThreadPoolExecutor(max_workers=args.workers) as pool:
+    futures = [
+      pool.submit(_run_one, index, config, overrides, label, args)
+      for index, (config, overrides, label) in enumerate(jobs)
+    ]
+    rows = [future.result() for future in futures]
+
+  param_names, metric_names = _write_table(rows, args.out)
+  objective = args.objective or spec.get("objective") or (metric_names[0] if metric_names else None)
+  maximize = args.maximize or bool(spec.get("maximize", False))
+  best = _best(rows, objective, maximize)
+  _write_markdown(rows, param_names, metric_names, best, objective, args.out)
+  summary = {
+    "runs": len(rows),
+    "ok": sum(r["status"] == "ok" for r in rows),
+    "failed": sum(r["status"] != "ok" for r in rows),
+    "seconds": round(time.monotonic() - started, 3),
+    "params": param_names,
+    "metrics": metric_names,
+    "objective": objective,
+    "maximize": maximize,
+    "best": best,
+    "table_path": str(args.out / "results.csv"),
+    "summary_path": str(args.out / "summary.md"),
+    "plots": _write_plots(rows, param_names, metric_names, args.out),
+    "rows": rows,
+  }
+  (args.out / "summary.json").write_text(json.dumps(summary, indent=2))
+  return summary
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description="Run run_experiment.py over a parameter sweep")
+  parser.add_argument("--spec", default="configs/sweep.yaml", help="Sweep spec (YAML)")
+  parser.add_argument("--out", type=Path, default=Path("results/sweep"), help="Output directory")
+  parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+  parser.add_argument("--timeout", type=int, default=60, help="Per-run limit in seconds")
+  parser.add_argument("--memory-mb", type=int, default=0, help="Per-run address-space limit")
+  parser.add_argument("--max-runs", type=int, default=0, help="Cap on the number of runs")
+  parser.add_argument("--objective", help="Metric that picks the best run")
+  parser.add_argument("--maximize", action="store_true", help="Higher objective is better")
+  summary = run_sweep(parser.parse_args())
+  print(f"[sweep] {summary['ok']}/{summary['runs']} ok in {summary['seconds']}s")
+  return 0 if summary["ok"] else 1
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
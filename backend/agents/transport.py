@@ -0,0 +1,230 @@
+"""Transport layer for provider calls: pooled keep-alive HTTP, deadlines, retries, hedging.
+
+Every LLM/OCR call runs on a shared worker pool so the caller can enforce a wall-clock
+deadline. Transient failures are retried with full-jitter exponential backoff. Once a
+route has enough latency history, a call that is still pending past the route's
+LLM_HEDGE_PERCENTILE latency gets one duplicate request and the first response wins.
+When a provider is given, every request (hedges included) holds a `governor` slot.
+"""
+
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+import httpx
+
+from agents import governor
+
+HEDGE_ENABLED = os.environ.get("LLM_HEDGE", "1") != "0"
+HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "1.0"))
+BACKOFF_CAP = float(os.environ.get("LLM_BACKOFF_CAP", "20.0"))
+
+_LATENCY_WINDOW = 200
+
+
+class DeadlineExceeded(TimeoutError):
+  pass
+
+
+@lru_cache(maxsize=1)
+def http_client() -> httpx.Client:
+  """Process-wide keep-alive pool shared by the OpenAI-compatible and Mistral clients."""
+  return httpx.Client(
+    limits=httpx.Limits(
+      max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", "64")),
+      max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE", "16")),
+      keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "60")),
+    ),
+    timeout=httpx.Timeout(connect=10.0, read=None, write=60.0, pool=30.0),
+  )
+
+
+@lru_cache(maxsize=1)
+def _pool() -> ThreadPoolExecutor:
+  return ThreadPoolExecutor(
+    max_workers=int(os.environ.get("LLM_TRANSPORT_WORKERS", "32")), thread_name_prefix="llm"
+  )
+
+
+def _is_transient(exc: BaseException) -> bool:
+  import openai
+
+  if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+    return True
+  if isinstance(exc, openai.APIStatusError):
+    return exc.status_code >= 500
+  if isinstance(exc, httpx.TransportError):
+    return True
+  status = getattr(exc, "status_code", None)
+  return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_latencies: dict[str, deque] = {}
+_counters: dict[str, dict] = {}
+
+
+def _count(name: str, key: str, n: int = 1) -> None:
+  with _lock:
+    entry = _counters.setdefault(
+      name, {"calls": 0, "retries": 0, "deadline_exceeded": 0, "hedges": 0, "hedge_wins": 0}
+    )
+    entry[key] += n
+
+
+def _observe(name: str, seconds: float) -> None:
+  with _lock:
+    _latencies.setdefault(name, deque(maxlen=_LATENCY_WINDOW)).append(seconds)
+
+
+def _hedge_after(name: str) -> float | None:
+  with _lock:
+    samples = sorted(_latencies.get(name, ()))
+  if len(samples) < HEDGE_MIN_SAMPLES:
+    return None
+  return samples[min(len(samples) - 1, int(HEDGE_PERCENTILE * (len(samples) - 1)))]
+
+
+def transport_stats() -> dict:
+  with _lock:
+    counters = {name: dict(entry) for name, entry in _counters.items()}
+    latencies = {name: list(values) for name, values in _latencies.items()}
+  out = {}
+  for name, entry in counters.items():
+    hedge_after = _hedge_after(name)
+    out[name] = {
+      **entry,
+      "hedge_rate": round(entry["hedges"] / entry["calls"], 4) if entry["calls"] else 0.0,
+      "hedge_win_rate": round(entry["hedge_wins"] / entry["hedges"], 4) if entry["hedges"] else 0.0,
+      "hedge_after_s": round(hedge_after, 3) if hedge_after is not None else None,
+      "median_s": round(statistics.median(latencies[name]), 3) if latencies.get(name) else None,
+    }
+  return out
+
+
+# ---------------------------------------------------------------------------
+# Calls
+# ---------------------------------------------------------------------------
+
+
+def usage_tokens(result) -> int | None:
+  """Total tokens reported by a chat result (AIMessage or include_raw dict), if any."""
+  if isinstance(result, dict):
+    result = result.get("raw")
+  usage = getattr(result, "usage_metadata", None)
+  if usage:
+    return usage.get("total_tokens")
+  return None
+
+
+def _submit(fn, ticket) -> Future:
+  future = _pool().submit(fn)
+  if ticket is not None:
+    future.add_done_callback(
+      lambda f: governor.release(ticket, None if f.exception() else usage_tokens(f.result()))
+    )
+  return future
+
+
+def _attempt(name: str, fn, remaining: float, hedge: bool, provider: str | None, tokens: float):
+  """Run *fn* once (plus at most one hedge). Returns the first successful result."""
+  start = time.perf_counter()
+  ticket = None
+  if provider is not None:
+    ticket = governor.acquire(provider, tokens, timeout=remaining)
+    if ticket is None:
+      raise DeadlineExceeded(f"{name}: no {provider} capacity within {remaining:.1f}s")
+    remaining -= time.perf_counter() - start
+    start = time.perf_counter()
+  primary: Future = _submit(fn, ticket)
+  pending = {primary}
+
+  hedge_after = _hedge_after(name) if hedge and HEDGE_ENABLED else None
+  if hedge_after is not None and hedge_after < remaining:
+    done, _ = wait(pending, timeout=hedge_after)
+    hedge_ticket = None
+    if not done and provider is not None:
+      hedge_ticket = governor.try_acquire(provider, tokens)
+    if not done and (provider is None or hedge_ticket is not None):
+      _count(name, "hedges")
+      print(f"[Transport] {name}: no response after {hedge_after:.1f}s — hedging")
+      pending.add(_submit(fn, hedge_ticket))
+
+  last_exc: BaseException | None = None
+  while pending:
+    left = remaining - (time.perf_counter() - start)
+    if left <= 0:
+      break
+    done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+    for future in done:
+      exc = future.exception()
+      if exc is not None:
+        last_exc = exc
+        continue
+      if future is not primary:
+        _count(name, "hedge_wins")
+      _observe(name, time.perf_counter() - start)
+      return future.result()
+
+  if last_exc is not None:
+    raise last_exc
+  raise DeadlineExceeded(f"{name}: no response within {remaining:.1f}s")
+
+
+def _retry_after(exc: BaseException) -> float | None:
+  response = getattr(exc, "response", None)
+  if response is None or getattr(response, "status_code", None) != 429:
+    return None
+  try:
+    return float(response.headers.get("retry-after", "1"))
+  except (TypeError, ValueError):
+    return 1.0
+
+
+def call(
+  name: str,
+  fn,
+  timeout: float,
+  hedge: bool = True,
+  provider: str | None = None,
+  tokens: float = 0,
+):
+  """Invoke *fn* under a wall-clock deadline of *timeout* seconds, retrying transient errors.
+
+  *provider* and the estimated *tokens* are passed to the governor for rate limiting.
+  """
+  _count(name, "calls")
+  deadline = time.perf_counter() + timeout
+  attempt = 0
+  while True:
+    remaining = deadline - time.perf_counter()
+    try:
+      return _attempt(name, fn, remaining, hedge, provider, tokens)
+    except DeadlineExceeded:
+      _count(name, "deadline_exceeded")
+      raise
+    except Exception as exc:
+      if attempt >= MAX_RETRIES or not _is_transient(exc):
+        raise
+      delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+      retry_after = _retry_after(exc)
+      if provider is not None and retry_after is not None:
+        governor.backoff(provider, retry_after)
+      if time.perf_counter() + delay >= deadline:
+        raise
+      attempt += 1
+      _count(name, "retries")
+      print(f"[Transport] {name}: transient error {exc!r} — retry {attempt} in {delay:.1f}s")
+      time.sleep(delay)
@@ -0,0 +1,235 @@
+"""Offline batch mode: run the graph over a directory or manifest of papers.
+
+Run from `backend/`:
+
+  python batch.py papers/ --instructions "Reproduce the main experiment" --concurrency 8
+  python batch.py manifest.jsonl --concurrency 8 --output batch_results/
+
+A directory input takes every `*.pdf` in it; `<name>.txt` next to a PDF overrides the
+default instructions. A manifest is JSONL (`{"pdf": ..., "instructions": ...}`) or CSV
+with `pdf` and `instructions` columns; relative paths resolve against the manifest.
+
+All papers run in one process, so the LLM clients, provider governor, implementation
+library and fork server are shared. Each finished paper appends a row to
+`<output>/index.jsonl` (and `index.csv` is rewritten at the end); papers whose key
+(PDF hash + instructions) already has a completed row are skipped on the next run.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+
+from agents import artifacts, budget
+from agents.governor import job_scope
+from state import new_state
+
+_CSV_FIELDS = [
+  "key",
+  "pdf",
+  "status",
+  "verdict",
+  "success",
+  "revisions",
+  "review_iterations",
+  "duration_s",
+  "tokens",
+  "cost_usd",
+  "repo_path",
+  "error",
+  "finished_at",
+]
+
+
+def _read_manifest(path: Path, default_instructions: str) -> list[dict]:
+  if path.is_dir():
+    papers = []
+    for pdf in sorted(path.glob("*.pdf")):
+      sidecar = pdf.with_suffix(".txt")
+      instructions = sidecar.read_text().strip() if sidecar.exists() else default_instructions
+      papers.append({"pdf": pdf, "instructions": instructions})
+    return papers
+
+  if path.suffix == ".csv":
+    with open(path, newline="") as f:
+      rows = list(csv.DictReader(f))
+  else:
+    rows = [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+  return [
+    {
+      "pdf": (path.parent / row["pdf"]).resolve(),
+      "instructions": (row.get("instructions") or default_instructions).strip(),
+    }
+    for row in rows
+  ]
+
+
+def paper_key(pdf: Path, instructions: str) -> str:
+  digest = hashlib.sha256(pdf.read_bytes())
+  digest.update(b"\0" + " ".join(instructions.split()).encode())
+  return digest.hexdigest()[:20]
+
+
+def _completed_keys(index_path: Path) -> set[str]:
+  if not index_path.exists():
+    return set()
+  keys = set()
+  for line in index_path.read_text().splitlines():
+    try:
+      row = json.loads(line)
+    except json.JSONDecodeError:
+      continue
+    if row.get("status") == "completed":
+      keys.add(row["key"])
+  return keys
+
+
+class _Index:
+  """Append-only JSONL index; one row per finished paper."""
+
+  def __init__(self, path: Path):
+    self.path = path
+    self._lock = threading.Lock()
+
+  def append(self, row: dict) -> None:
+    with self._lock, open(self.path, "a") as f:
+      f.write(json.dumps(row) + "\n")
+
+  def write_csv(self, csv_path: Path) -> None:
+    # Latest row per key, in first-seen order
+    latest: dict[str, dict] = {}
+    for line in self.path.read_text().splitlines():
+      if line.strip():
+        row = json.loads(line)
+        latest[row["key"]] = row
+    with open(csv_path, "w", newline="") as f:
+      writer = csv.DictWriter(f, fieldnames=_CSV_FIELDS, extrasaction="ignore")
+      writer.writeheader()
+      writer.writerows(latest.values())
+
+
+async def _run_paper(graph, paper: dict, key: str) -> dict:
+  started = time.perf_counter()
+  node_seconds: dict[str, float] = {}
+  revisions = 0
+  state = new_state(str(paper["pdf"]), paper["instructions"])
+  row = {"key": key, "pdf": str(paper["pdf"]), "instructions": paper["instructions"]}
+  job_id = f"batch-{key}-{uuid.uuid4().hex[:6]}"
+  budget.start(job_id)
+  try:
+    last = time.perf_counter()
+    with job_scope(job_id):
+      async for event in graph.astream(state):
+        now = time.perf_counter()
+        for node_name, node_state in event.items():
+          node_seconds[node_name] = round(node_seconds.get(node_name, 0.0) + now - last, 3)
+          revisions += node_name == "debugger"
+          state = {**state, **node_state}
+        last = now
+  except Exception as exc:
+    traceback.print_exc()
+    row.update(status="error", error=f"{type(exc).__name__}: {exc}")
+  else:
+    row.update(status="completed", error="")
+
+  feedback = state.get("review_feedback") or {}
+  spent = budget.finish(job_id)
+  row.update(
+    verdict=feedback.get("verdict", ""),
+    success=bool(state.get("execution_success")),
+    revisions=revisions,
+    review_iterations=state.get("review_iteration", 0),
+    duration_s=round(time.perf_counter() - started, 3),
+    tokens=spent["tokens"],
+    cost_usd=spent["cost_usd"],
+    budget_level=spent["level"],
+    degradations=spent["degradations"],
+    node_seconds=node_seconds,
+    repo_path=state.get("output_repo_path", ""),
+    key_metrics=(state.get("run_result") or {}).get("key_metrics", {}),
+    finished_at=datetime.now(UTC).isoformat(),
+  )
+  artifacts.discard_job(job_id)
+  return row
+
+
+async def run_batch(papers: list[dict], output_dir: Path, concurrency: int, force: bool) -> dict:
+  from graph import get_graph
+
+  output_dir.mkdir(parents=True, exist_ok=True)
+  index = _Index(output_dir / "index.jsonl")
+  done = set() if force else _completed_keys(index.path)
+
+  todo = []
+  for paper in papers:
+    key = paper_key(paper["pdf"], paper["instructions"])
+    if key in done:
+      print(f"[Batch] Skipping {paper['pdf'].name} — already completed")
+      continue
+    todo.append((paper, key))
+
+  # Sync graph nodes run on the loop's default executor; size it for the batch
+  loop = asyncio.get_running_loop()
+  loop.set_default_executor(ThreadPoolExecutor(max_workers=max(8, concurrency * 2)))
+  graph = get_graph()
+  semaphore = asyncio.Semaphore(concurrency)
+  counts = {"completed": 0, "error": 0}
+
+  async def worker(paper: dict, key: str) -> None:
+    async with semaphore:
+      print(f"[Batch] Starting {paper['pdf'].name} ({key})")
+      row = await _run_paper(graph, paper, key)
+      index.append(row)
+      counts[row["status"]] += 1
+      print(
+        f"[Batch] {row['status']} {paper['pdf'].name} in {row['duration_s']}s — "
+        f"verdict={row['verdict'] or '-'}, success={row['success']}, revisions={row['revisions']}"
+      )
+
+  started = time.perf_counter()
+  await asyncio.gather(*(worker(paper, key) for paper, key in todo))
+  wall = time.perf_counter() - started
+  if index.path.exists():
+    index.write_csv(output_dir / "index.csv")
+  return {
+    "papers": len(papers),
+    "skipped": len(papers) - len(todo),
+    **counts,
+    "wall_s": round(wall, 3),
+    "papers_per_hour": round(len(todo) / wall * 3600, 2) if todo and wall else 0.0,
+  }
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description="Run Descartes over a batch of papers")
+  parser.add_argument("input", type=Path, help="Directory of PDFs or a .jsonl/.csv manifest")
+  parser.add_argument(
+    "--instructions",
+    default="Reproduce the paper's main method and experiment.",
+    help="Instructions for papers without their own",
+  )
+  parser.add_argument("--concurrency", type=int, default=4, help="Papers processed at once")
+  parser.add_argument("--output", type=Path, default=Path("batch_results"), help="Index directory")
+  parser.add_argument("--force", action="store_true", help="Re-run papers already completed")
+  args = parser.parse_args()
+
+  papers = _read_manifest(args.input, args.instructions)
+  missing = [str(p["pdf"]) for p in papers if not p["pdf"].exists()]
+  if missing:
+    parser.error(f"missing PDFs: {missing}")
+  summary = asyncio.run(run_batch(papers, args.output, args.concurrency, args.force))
+  print(f"[Batch] Done — {json.dumps(summary)}")
+  print(f"[Batch] Index written to {args.output / 'index.jsonl'}")
+  return 0 if not summary["error"] else 1
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
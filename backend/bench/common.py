@@ -0,0 +1,27 @@
+"""Helpers shared by the benchmark tools."""
+
+import socket
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def git_commit() -> str:
+  try:
+    out = subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"],
+      cwd=BACKEND_DIR,
+      capture_output=True,
+      text=True,
+      timeout=10,
+    )
+    return out.stdout.strip() or "unknown"
+  except (OSError, subprocess.SubprocessError):
+    return "unknown"
+
+
+def free_port() -> int:
+  with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    return s.getsockname()[1]
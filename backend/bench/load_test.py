@@ -0,0 +1,336 @@
+"""Concurrent-load harness for the `/generate` SSE endpoint.
+
+Starts the app from `main.py` in a child process with stub LLM/OCR backends and a stub
+executor, opens N concurrent multipart uploads with SSE consumers, and writes a JSON
+report (throughput, event latency percentiles, event-loop lag, thread-pool saturation
+and RSS over time) that can be diffed across commits.
+
+Run from `backend/`:
+  python -m bench.load_test --streams 32 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+
+from bench.common import BACKEND_DIR, free_port, git_commit
+
+STATS_PATH = "/_bench/stats"
+_LAG_INTERVAL = 0.05
+
+
+def _percentiles(values: list[float]) -> dict:
+  if not values:
+    return {"count": 0}
+  ordered = sorted(values)
+
+  def pick(q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+  return {
+    "count": len(ordered),
+    "mean": round(statistics.fmean(ordered), 3),
+    "p50": round(pick(0.50), 3),
+    "p90": round(pick(0.90), 3),
+    "p95": round(pick(0.95), 3),
+    "p99": round(pick(0.99), 3),
+    "max": round(ordered[-1], 3),
+  }
+
+
+def _rss_bytes() -> int:
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except (OSError, ValueError):
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ---------------------------------------------------------------------------
+# Server side
+# ---------------------------------------------------------------------------
+
+
+def serve(args: argparse.Namespace) -> None:
+  from bench.stubs import install_stubs
+
+  store_dir = Path(args.store_dir) if args.store_dir else None
+  install_stubs(args.llm_delay, args.ocr_delay, args.exec_delay, args.exec_output_kb, store_dir)
+
+  import uvicorn
+
+  from main import app
+
+  lags: list[float] = []
+  window = {"max_lag": 0.0}
+
+  async def lag_sampler():
+    while True:
+      start = time.perf_counter()
+      await asyncio.sleep(_LAG_INTERVAL)
+      lag = max(0.0, time.perf_counter() - start - _LAG_INTERVAL) * 1000
+      lags.append(lag)
+      window["max_lag"] = max(window["max_lag"], lag)
+
+  async def bench_stats():
+    if not hasattr(app.state, "lag_task"):
+      app.state.lag_task = asyncio.create_task(lag_sampler())
+    loop = asyncio.get_running_loop()
+    executor = getattr(loop, "_default_executor", None)
+    threads = len(getattr(executor, "_threads", ()))
+    idle = getattr(getattr(executor, "_idle_semaphore", None), "_value", 0)
+    queue = getattr(executor, "_work_queue", None)
+    stats = {
+      "rss_bytes": _rss_bytes(),
+      "loop_lag_ms_max": round(window["max_lag"], 3),
+      "pool_max_workers": getattr(executor, "_max_workers", 0),
+      "pool_threads": threads,
+      "pool_busy": max(0, threads - idle),
+      "pool_queue_depth": queue.qsize() if queue is not None else 0,
+      "tasks": len(asyncio.all_tasks()),
+    }
+    window["max_lag"] = 0.0
+    return stats
+
+  async def bench_lags():
+    return {"loop_lag_ms": lags}
+
+  app.add_api_route(STATS_PATH, bench_stats, methods=["GET"])
+  app.add_api_route("/_bench/lags", bench_lags, methods=["GET"])
+
+  uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+
+async def _run_stream(
+  client: httpx.AsyncClient, base_url: str, pdf_bytes: bytes, idx: int, counters: dict
+) -> dict:
+  record: dict = {"index": idx, "events": 0, "error": None}
+  submitted = time.perf_counter()
+  arrivals: list[float] = []
+  counters["open"] += 1
+  try:
+    async with client.stream(
+      "POST",
+      f"{base_url}/generate",
+      files={"file": (f"paper_{idx}.pdf", pdf_bytes, "application/pdf")},
+      data={"prompt": f"load test stream {idx}", "password": "Dhruv"},
+    ) as resp:
+      if resp.status_code != 200:
+        record["error"] = f"HTTP {resp.status_code}"
+        return record
+      event_type = None
+      async for line in resp.aiter_lines():
+        if line.startswith("event:"):
+          event_type = line[6:].strip()
+        elif line.startswith("data:") and event_type == "agent":
+          arrivals.append(time.perf_counter())
+          counters["events"] += 1
+          if json.loads(line[5:]).get("node") == "done":
+            record["done"] = True
+          event_type = None
+  except (httpx.HTTPError, json.JSONDecodeError) as exc:
+    record["error"] = repr(exc)
+  finally:
+    counters["open"] -= 1
+
+  record["events"] = len(arrivals)
+  if arrivals:
+    record["first_event_ms"] = (arrivals[0] - submitted) * 1000
+    record["gaps_ms"] = [(b - a) * 1000 for a, b in zip(arrivals, arrivals[1:], strict=False)]
+  record["total_ms"] = (time.perf_counter() - submitted) * 1000
+  if not record.get("done") and not record["error"]:
+    record["error"] = "stream ended without done event"
+  return record
+
+
+async def _sample_server(
+  client: httpx.AsyncClient,
+  base_url: str,
+  interval: float,
+  started: float,
+  counters: dict,
+  out: list,
+) -> None:
+  while True:
+    try:
+      resp = await client.get(f"{base_url}{STATS_PATH}")
+      sample = resp.json()
+      sample["t"] = round(time.perf_counter() - started, 3)
+      sample["rss_mb"] = round(sample.pop("rss_bytes") / 2**20, 2)
+      sample["open_streams"] = counters["open"]
+      sample["events_received"] = counters["events"]
+      out.append(sample)
+    except httpx.HTTPError:
+      pass
+    await asyncio.sleep(interval)
+
+
+async def _wait_ready(client: httpx.AsyncClient, base_url: str, proc: subprocess.Popen) -> None:
+  deadline = time.monotonic() + 60
+  while time.monotonic() < deadline:
+    if proc.poll() is not None:
+      raise RuntimeError(f"Server exited early with code {proc.returncode}")
+    try:
+      resp = await client.get(f"{base_url}/health")
+      if resp.status_code == 200 and resp.json().get("graph", "ready") == "ready":
+        return
+    except httpx.HTTPError:
+      pass
+    await asyncio.sleep(0.1)
+  raise RuntimeError("Server did not become healthy within 60s")
+
+
+async def drive(args: argparse.Namespace, base_url: str, proc: subprocess.Popen) -> dict:
+  from bench.stubs import ideal_pipeline_seconds
+
+  pdf_bytes = b"%PDF-1.4\n" + b"0" * (args.pdf_kb * 1024)
+  limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=8)
+  counters = {"open": 0, "events": 0}
+  samples: list[dict] = []
+
+  async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+    await _wait_ready(client, base_url, proc)
+    started = time.perf_counter()
+    sampler = asyncio.create_task(
+      _sample_server(client, base_url, args.sample_interval, started, counters, samples)
+    )
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def gated(i: int) -> dict:
+      async with gate:
+        return await _run_stream(client, base_url, pdf_bytes, i, counters)
+
+    records = await asyncio.gather(*(gated(i) for i in range(args.streams)))
+    wall = time.perf_counter() - started
+    await asyncio.sleep(args.sample_interval)
+    sampler.cancel()
+    lags = (await client.get(f"{base_url}/_bench/lags")).json()["loop_lag_ms"]
+
+  ok = [r for r in records if not r["error"]]
+  ideal_ms = ideal_pipeline_seconds(args.llm_delay, args.ocr_delay, args.exec_delay) * 1000
+  rss = [s["rss_mb"] for s in samples]
+  return {
+    "meta": {
+      "commit": git_commit(),
+      "timestamp": datetime.now(UTC).isoformat(),
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "params": vars(args),
+    },
+    "summary": {
+      "streams": args.streams,
+      "concurrency": args.concurrency,
+      "completed": len(ok),
+      "failed": len(records) - len(ok),
+      "wall_s": round(wall, 3),
+      "throughput_streams_per_s": round(len(ok) / wall, 4) if wall else 0.0,
+      "events_total": counters["events"],
+      "events_per_s": round(counters["events"] / wall, 3) if wall else 0.0,
+      "ideal_stream_ms": round(ideal_ms, 1),
+    },
+    "latency_ms": {
+      "time_to_first_event": _percentiles([r["first_event_ms"] for r in ok]),
+      "inter_event": _percentiles([g for r in ok for g in r.get("gaps_ms", [])]),
+      "stream_total": _percentiles([r["total_ms"] for r in ok]),
+      "overhead_vs_ideal": _percentiles([r["total_ms"] - ideal_ms for r in ok]),
+    },
+    "loop_lag_ms": _percentiles(lags),
+    "thread_pool": {
+      "max_workers": max((s["pool_max_workers"] for s in samples), default=0),
+      "max_threads": max((s["pool_threads"] for s in samples), default=0),
+      "max_busy": max((s["pool_busy"] for s in samples), default=0),
+      "max_queue_depth": max((s["pool_queue_depth"] for s in samples), default=0),
+      "saturated_samples": sum(
+        1 for s in samples if s["pool_max_workers"] and s["pool_busy"] >= s["pool_max_workers"]
+      ),
+    },
+    "rss_mb": {
+      "start": rss[0] if rss else None,
+      "peak": max(rss) if rss else None,
+      "end": rss[-1] if rss else None,
+    },
+    "errors": [{"index": r["index"], "error": r["error"]} for r in records if r["error"]],
+    "timeseries": samples,
+  }
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description="Concurrent /generate load test with stub backends")
+  parser.add_argument("--streams", type=int, default=16, help="Total uploads to perform")
+  parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous open streams")
+  parser.add_argument("--llm-delay", type=float, default=0.5, help="Seconds per stub LLM call")
+  parser.add_argument("--ocr-delay", type=float, default=0.5, help="Seconds per stub OCR call")
+  parser.add_argument("--exec-delay", type=float, default=1.0, help="Seconds per stub executor run")
+  parser.add_argument("--exec-output-kb", type=int, default=4, help="Stub execution_output size")
+  parser.add_argument("--pdf-kb", type=int, default=256, help="Uploaded dummy PDF size")
+  parser.add_argument(
+    "--sample-interval", type=float, default=0.25, help="Server stats poll period"
+  )
+  parser.add_argument("--output", default=None, help="Report path (default bench_results/)")
+  parser.add_argument("--verbose", action="store_true", help="Show server stdout")
+  parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+  parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+  parser.add_argument("--store-dir", default=None, help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.serve:
+    serve(args)
+    return 0
+
+  port = free_port()
+  cmd = [sys.executable, "-m", "bench.load_test", "--serve", "--port", str(port)]
+  for flag in ("llm_delay", "ocr_delay", "exec_delay", "exec_output_kb"):
+    cmd += [f"--{flag.replace('_', '-')}", str(getattr(args, flag))]
+  # The server's stores live here, owned by this process since uvicorn dies on SIGTERM
+  store_dir = tempfile.TemporaryDirectory(prefix="descartes-bench-")
+  cmd += ["--store-dir", store_dir.name]
+  sink = None if args.verbose else subprocess.DEVNULL
+  proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=sink, stderr=sink)
+  try:
+    report = asyncio.run(drive(args, f"http://127.0.0.1:{port}", proc))
+  finally:
+    proc.terminate()
+    try:
+      proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+      proc.kill()
+    store_dir.cleanup()
+
+  out_path = Path(
+    args.output or BACKEND_DIR / "bench_results" / f"load_{report['meta']['commit']}.json"
+  )
+  out_path.parent.mkdir(parents=True, exist_ok=True)
+  out_path.write_text(json.dumps(report, indent=2))
+
+  summary = report["summary"]
+  print(
+    f"[Bench] {summary['completed']}/{summary['streams']} streams in {summary['wall_s']}s "
+    f"({summary['throughput_streams_per_s']} streams/s), "
+    f"stream p95={report['latency_ms']['stream_total'].get('p95')}ms, "
+    f"loop lag p99={report['loop_lag_ms'].get('p99')}ms, "
+    f"peak RSS={report['rss_mb']['peak']}MB"
+  )
+  print(f"[Bench] Report written to {out_path}")
+  return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
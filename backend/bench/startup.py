@@ -0,0 +1,175 @@
+"""Cold-start benchmark: `import main` time, time to `/health` and time until the graph is ready.
+
+Each measurement uses a fresh interpreter with provider API keys removed from the
+environment, so it also checks that importing and starting the app has no dependency on
+credentials. Writes a JSON report that can be compared across commits.
+
+Run from `backend/`:
+  python -m bench.startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+
+from bench.common import BACKEND_DIR, free_port, git_commit
+
+_IMPORT_SNIPPET = (
+  "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+)
+
+
+def _clean_env() -> dict:
+  env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+  env.pop("GITHUB_TOKEN", None)
+  return env
+
+
+def _import_seconds() -> float:
+  out = subprocess.run(
+    [sys.executable, "-c", _IMPORT_SNIPPET],
+    cwd=BACKEND_DIR,
+    env=_clean_env(),
+    capture_output=True,
+    text=True,
+    timeout=120,
+    check=True,
+  )
+  return float(out.stdout.strip().splitlines()[-1])
+
+
+def _slowest_imports(limit: int) -> list[dict]:
+  """Top cumulative entries from `python -X importtime -c 'import main'`."""
+  out = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", "import main"],
+    cwd=BACKEND_DIR,
+    env=_clean_env(),
+    capture_output=True,
+    text=True,
+    timeout=120,
+  )
+  rows = []
+  for line in out.stderr.splitlines():
+    if not line.startswith("import time:") or "cumulative" in line:
+      continue
+    self_us, cumulative_us, name = line.removeprefix("import time:").split("|", 2)
+    rows.append(
+      {
+        "module": name.strip(),
+        "self_ms": int(self_us) / 1000,
+        "cumulative_ms": int(cumulative_us) / 1000,
+      }
+    )
+  rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+  return rows[:limit]
+
+
+def _serve_timings(timeout: float) -> dict:
+  port = free_port()
+  started = time.perf_counter()
+  proc = subprocess.Popen(
+    [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+    cwd=BACKEND_DIR,
+    env=_clean_env(),
+    stdout=subprocess.DEVNULL,
+    stderr=subprocess.DEVNULL,
+  )
+  timings: dict = {"health_s": None, "graph_ready_s": None}
+  try:
+    with httpx.Client(timeout=2) as client:
+      while time.perf_counter() - started < timeout:
+        if proc.poll() is not None:
+          timings["error"] = f"server exited with code {proc.returncode}"
+          break
+        try:
+          resp = client.get(f"http://127.0.0.1:{port}/health")
+        except httpx.HTTPError:
+          time.sleep(0.02)
+          continue
+        elapsed = time.perf_counter() - started
+        if timings["health_s"] is None:
+          timings["health_s"] = elapsed
+        graph = resp.json().get("graph", "ready")
+        if graph == "ready":
+          timings["graph_ready_s"] = elapsed
+          break
+        if graph == "failed":
+          timings["error"] = f"graph failed to load: {resp.json().get('error')}"
+          break
+        time.sleep(0.02)
+  finally:
+    proc.terminate()
+    try:
+      proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+      proc.kill()
+  return timings
+
+
+def _summary(values: list[float]) -> dict:
+  if not values:
+    return {"count": 0}
+  return {
+    "count": len(values),
+    "median_s": round(statistics.median(values), 4),
+    "min_s": round(min(values), 4),
+    "max_s": round(max(values), 4),
+  }
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description="Measure API cold-start time")
+  parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+  parser.add_argument(
+    "--timeout", type=float, default=120, help="Max seconds to wait for the server"
+  )
+  parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+  parser.add_argument("--output", default=None, help="Report path (default bench_results/)")
+  args = parser.parse_args()
+
+  import_times = [_import_seconds() for _ in range(args.runs)]
+  serve_runs = [_serve_timings(args.timeout) for _ in range(args.runs)]
+  errors = [run["error"] for run in serve_runs if "error" in run]
+
+  report = {
+    "meta": {
+      "commit": git_commit(),
+      "timestamp": datetime.now(UTC).isoformat(),
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "params": vars(args),
+    },
+    "import_main": _summary(import_times),
+    "time_to_health": _summary([r["health_s"] for r in serve_runs if r["health_s"] is not None]),
+    "time_to_graph_ready": _summary(
+      [r["graph_ready_s"] for r in serve_runs if r["graph_ready_s"] is not None]
+    ),
+    "slowest_imports": _slowest_imports(args.top),
+    "errors": errors,
+  }
+
+  out_path = Path(
+    args.output or BACKEND_DIR / "bench_results" / f"startup_{report['meta']['commit']}.json"
+  )
+  out_path.parent.mkdir(parents=True, exist_ok=True)
+  out_path.write_text(json.dumps(report, indent=2))
+  print(
+    f"[Bench] import main median={report['import_main'].get('median_s')}s, "
+    f"/health median={report['time_to_health'].get('median_s')}s, "
+    f"graph ready median={report['time_to_graph_ready'].get('median_s')}s"
+  )
+  print(f"[Bench] Report written to {out_path}")
+  return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
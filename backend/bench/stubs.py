@@ -0,0 +1,169 @@
+"""Stub LLM, OCR and executor backends used by the benchmark tools.
+
+Stubs must be installed before the graph is built, since `graph` binds its nodes at
+import time. Clients are patched through the `agents.llm` factories.
+"""
+
+import atexit
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import typing
+from pathlib import Path
+from types import SimpleNamespace
+
+from agents import artifacts
+
+_STUB_CODE = """\
+import yaml
+
+
+def run_experiment(config_path: str) -> dict:
+  with open(config_path) as f:
+    config = yaml.safe_load(f)
+  return {"objective": 0.0, "iterations": config.get("max_iter", 1)}
+"""
+
+
+def _stub_value(annotation):
+  origin = typing.get_origin(annotation)
+  if origin is typing.Literal:
+    return typing.get_args(annotation)[0]
+  if origin is list:
+    return [_stub_value(typing.get_args(annotation)[0])]
+  if isinstance(annotation, type) and hasattr(annotation, "model_fields"):
+    return _stub_structured(annotation)
+  if origin is dict:
+    return {}
+  if annotation is bool:
+    return False
+  if annotation is int:
+    return 0
+  return "stub"
+
+
+def _stub_structured(schema):
+  values = {name: _stub_value(field.annotation) for name, field in schema.model_fields.items()}
+  return schema(**values)
+
+
+class StubChatModel:
+  """Quacks like the parts of `BaseChatOpenAI` the agents use."""
+
+  def __init__(self, delay: float):
+    self.delay = delay
+
+  def invoke(self, messages, *args, **kwargs):
+    from langchain_core.messages import AIMessage
+
+    time.sleep(self.delay)
+    return AIMessage(content=f"```python\n{_STUB_CODE}```")
+
+  def with_structured_output(self, schema, **kwargs):
+    model = self
+
+    include_raw = kwargs.get("include_raw", False)
+
+    class _Structured:
+      def invoke(self, messages, *args, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        time.sleep(model.delay)
+        parsed = _stub_structured(schema)
+        if not include_raw:
+          return parsed
+        raw = AIMessage(content=parsed.model_dump_json())
+        return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+    return _Structured()
+
+
+class StubMistral:
+  """Quacks like `get_mistral().ocr.process`."""
+
+  def __init__(self, delay: float, pages: int = 8):
+    self.ocr = self
+    self.delay = delay
+    self.pages = pages
+
+  def process(self, **kwargs):
+    time.sleep(self.delay)
+    annotation = {
+      "abstract": "Stub abstract.",
+      "methodology": "Stub methodology. " * 200,
+      "algorithms": ["Initialize x_0", "Repeat gradient step until convergence"],
+      "libraries": ["numpy"],
+    }
+    pages = [
+      SimpleNamespace(index=i, markdown=f"# Page {i}\n\n" + "Lorem ipsum dolor sit amet. " * 80)
+      for i in range(self.pages)
+    ]
+    return SimpleNamespace(document_annotation=json.dumps(annotation), pages=pages)
+
+
+def make_stub_executor(delay: float, output_kb: int):
+  def stub_executor_agent(state):
+    time.sleep(delay)
+    output = "x" * (output_kb * 1024)
+    return {
+      **state,
+      "execution_output": artifacts.put(output),
+      "execution_error": "",
+      "execution_success": True,
+      "status": "executed successfully",
+      "output_repo_path": "",
+      "observed_metrics": {"objective": 0.0},
+      "report_markdown": "# Reproduction Report\n",
+      "run_result": {"success": True, "key_metrics": {"objective": 0.0}},
+    }
+
+  return stub_executor_agent
+
+
+def install_stubs(
+  llm_delay: float,
+  ocr_delay: float,
+  exec_delay: float,
+  exec_output_kb: int = 4,
+  store_dir: Path | None = None,
+) -> None:
+  """Patch in the stub backends and move every on-disk store under *store_dir*.
+
+  Without *store_dir* a temporary directory is used and removed at exit.
+  """
+  os.environ.setdefault("DEEPSEEK_API_KEY", "stub")
+  os.environ.setdefault("MISTRAL_API_KEY", "stub")
+  os.environ.pop("GITHUB_TOKEN", None)
+
+  # Stub runs would otherwise land in the real stores, and the library would hand their
+  # placeholder code to the coder as verified prior work
+  if store_dir is None:
+    store_dir = Path(tempfile.mkdtemp(prefix="descartes-bench-"))
+    atexit.register(shutil.rmtree, store_dir, ignore_errors=True)
+  stores = {
+    "PAPERS_DIR": ("agents.retrieval", "agents.parser"),
+    "ARTIFACTS_DIR": ("agents.artifacts",),
+    "EXEC_CACHE_DIR": ("agents.run_cache",),
+    "LIBRARY_DIR": ("agents.library",),
+  }
+  for name, modules in stores.items():
+    path = store_dir / name.removesuffix("_DIR").lower()
+    os.environ[name] = str(path)
+    for module in modules:
+      # Some are already imported and bound their directory at import time
+      setattr(importlib.import_module(module), name, path)
+
+  import agents.executor
+  import agents.llm
+
+  agents.llm.build_chat_model = lambda spec, max_tokens, timeout: StubChatModel(llm_delay)
+  agents.llm.build_mistral_client = lambda: StubMistral(ocr_delay)
+  agents.executor.executor_agent = make_stub_executor(exec_delay, exec_output_kb)
+
+
+def ideal_pipeline_seconds(llm_delay: float, ocr_delay: float, exec_delay: float) -> float:
+  """Uncontended wall time of one stubbed run: parser, planner, coder, executor, reviewer."""
+  return ocr_delay + 3 * llm_delay + exec_delay
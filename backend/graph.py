@@ -1,11 +1,14 @@
 import os
+import threading
 
 from langgraph.graph import END, START, StateGraph
 
+from agents import budget
 from agents.coder import coder_agent
 from agents.debugger import debugger_agent
 from agents.executor import executor_agent
 from agents.github_publisher import github_publisher_agent
+from agents.optimizer import OPTIMIZER_ENABLED, optimizer_agent
 from agents.parser import parser_agent
 from agents.planner import planner_agent
 from agents.reviewer import reviewer_agent
@@ -20,10 +23,20 @@ def _publish_enabled() -> bool:
   return bool(token)
 
 
+def _finish_target() -> str:
+  return "github_publisher" if _publish_enabled() else END
+
 
 def route_after_executor(state: AgentState) -> str:
+  level = budget.level()
+  if level == "exhausted":
+    budget.degrade("budget exhausted — finalizing with the best passing revision")
+    return "finalize"
   if state["execution_success"]:
-    return "reviewer"
+    if OPTIMIZER_ENABLED and level == "degraded":
+      budget.degrade("skipped the vectorization pass")
+      return "reviewer"
+    return "optimizer" if OPTIMIZER_ENABLED else "reviewer"
   elif state["revision_count"] >= MAX_REVISIONS:
     print(
       f"[Graph] Max revisions ({MAX_REVISIONS}) reached — routing to reviewer without re-executing"
@@ -34,6 +47,13 @@ def route_after_executor(state: AgentState) -> str:
 
 
 def route_after_debugger(state: AgentState) -> str:
+  level = budget.level()
+  if level == "exhausted":
+    budget.degrade("budget exhausted — finalizing with the best passing revision")
+    return "finalize"
+  if level == "degraded" and state["debug_action"] == "recode":
+    budget.degrade("skipped a recode (patch-only debugging)")
+    return "finalize"
   if state["revision_count"] >= MAX_REVISIONS:
     print(f"[Graph] Max revisions ({MAX_REVISIONS}) reached after debug — routing to reviewer")
     return "reviewer"
@@ -43,11 +63,14 @@ def route_after_debugger(state: AgentState) -> str:
 
 
 def route_after_reviewer(state: AgentState) -> str:
-  publish_target = "github_publisher" if _publish_enabled() else END
+  publish_target = _finish_target()
   feedback = state.get("review_feedback", {})
   verdict = feedback.get("verdict", "complete")
   if verdict == "complete":
     return publish_target
+  if budget.level() != "ok":
+    budget.degrade(f"skipped the review loop (verdict '{verdict}')")
+    return "finalize"
   if state.get("review_iteration", 0) >= MAX_REVIEW_ITERATIONS:
     print(
       f"[Graph] Max review iterations ({MAX_REVIEW_ITERATIONS}) reached — ending despite verdict '{verdict}'"
@@ -57,6 +80,15 @@ def route_after_reviewer(state: AgentState) -> str:
   return "coder"
 
 
+def finalize_agent(state: AgentState) -> AgentState:
+  """End of a budget-limited run: fall back to the last revision that passed, if any."""
+  best = state.get("best_passing") or {}
+  if state["execution_success"] or not best:
+    return {**state, "status": "finalized"}
+  print("[Graph] Restoring the best passing revision before finishing")
+  return {**state, **best, "status": "finalized with the best passing revision"}
+
+
 def build_graph() -> StateGraph:
   graph = StateGraph(AgentState)
   graph.add_node("parser", parser_agent)
@@ -64,7 +96,9 @@ def build_graph() -> StateGraph:
   graph.add_node("coder", coder_agent)
   graph.add_node("executor", executor_agent)
   graph.add_node("debugger", debugger_agent)
+  graph.add_node("optimizer", optimizer_agent)
   graph.add_node("reviewer", reviewer_agent)
+  graph.add_node("finalize", finalize_agent)
   graph.add_node("github_publisher", github_publisher_agent)
 
   graph.add_edge(START, "parser")
@@ -73,10 +107,26 @@ def build_graph() -> StateGraph:
   graph.add_edge("coder", "executor")
   graph.add_conditional_edges("executor", route_after_executor)
   graph.add_conditional_edges("debugger", route_after_debugger)
+  graph.add_edge("optimizer", "reviewer")
   graph.add_conditional_edges("reviewer", route_after_reviewer)
+  graph.add_conditional_edges("finalize", lambda state: _finish_target())
   graph.add_edge("github_publisher", END)
 
   return graph.compile()
 
-graph = build_graph()
-print(graph.get_graph().draw_mermaid())
+
+_compiled = None
+_compiled_lock = threading.Lock()
+
+
+def get_graph():
+  """Compile the graph once per process."""
+  global _compiled
+  with _compiled_lock:
+    if _compiled is None:
+      _compiled = build_graph()
+  return _compiled
+
+
+if __name__ == "__main__":
+  print(build_graph().get_graph().draw_mermaid())
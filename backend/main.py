@@ -1,15 +1,48 @@
+import asyncio
+import hashlib
 import json
 import os
 import uuid
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
 
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sse_starlette.sse import EventSourceResponse
 
-from graph import graph
+from agents import artifacts, budget, events
+from agents.broker import broker_stats
+from agents.executor import EXECUTOR_BROKER
+from agents.fixer import fixer_stats
+from agents.governor import governor_stats, job_scope
+from agents.library import library_stats
+from agents.llm import route_stats
+from agents.run_cache import run_cache_stats
+from agents.structured import structured_stats
+from agents.transport import transport_stats
+from state import new_state
 
-app = FastAPI(title="Descartes")
+PDF_DIR = Path("/tmp/pdfs")
+
+
+def _load_graph():
+  # Imported here so importing main (and answering /health) doesn't wait on LangChain/LangGraph
+  from graph import get_graph
+
+  return get_graph()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  PDF_DIR.mkdir(parents=True, exist_ok=True)
+  app.state.graph_task = asyncio.create_task(asyncio.to_thread(_load_graph))
+  yield
+
+
+app = FastAPI(title="Descartes", lifespan=lifespan)
 
 _origins = os.environ.get("ALLOWED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,https://rene-jrl5.onrender.com")
 _origin_regex = os.environ.get(
@@ -24,80 +57,220 @@ app.add_middleware(
   allow_headers=["*"],
 )
 
-PDF_DIR = Path("/tmp/pdfs")
-PDF_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @app.get("/health")
-def health():
-  return {"status": "ok"}
+async def health():
+  task = app.state.graph_task
+  if not task.done():
+    return {"status": "ok", "graph": "loading"}
+  if task.cancelled() or task.exception() is not None:
+    # A graph that failed to compile can't serve /generate; say so instead of "ready"
+    error = "cancelled" if task.cancelled() else repr(task.exception())
+    return JSONResponse({"status": "error", "graph": "failed", "error": error}, status_code=503)
+  return {"status": "ok", "graph": "ready"}
+
+
+@app.get("/stats")
+def stats():
+  return {
+    "llm_routes": route_stats(),
+    "transport": transport_stats(),
+    "providers": governor_stats(),
+    "library": library_stats(),
+    "fixer": fixer_stats(),
+    "structured_output": structured_stats(),
+    "exec_cache": run_cache_stats(),
+    "broker": broker_stats(EXECUTOR_BROKER) if EXECUTOR_BROKER else None,
+    "flights": {"in_flight": len(_flights), "coalesced": _coalesced},
+  }
+
+
+class _Flight:
+  """One pipeline run shared by every identical concurrent request.
+
+  Events are recorded as they are emitted, so a request that attaches late first gets a
+  replay of everything sent so far and then the live stream. Node events are recorded as
+  their handle-only state and hydrated again on replay, so the history doesn't hold a
+  copy of every version of the code and logs.
+  """
+
+  def __init__(self, key: str, job_id: str):
+    self.key = key
+    self.job_id = job_id
+    self.history: list[dict | Callable[[], dict]] = []
+    self.subscribers: set[asyncio.Queue] = set()
+    self.task: asyncio.Task | None = None
+    self.finished = False
+
+  def emit(self, event: dict | None, replay: Callable[[], dict] | None = None) -> None:
+    """Send *event* to the subscribers; *replay*, if given, rebuilds it for late ones."""
+    # None marks the end of the stream
+    if event is None:
+      self.finished = True
+    else:
+      self.history.append(replay or event)
+    for queue in self.subscribers:
+      queue.put_nowait(event)
+
+  def attach(self) -> asyncio.Queue:
+    queue: asyncio.Queue = asyncio.Queue()
+    for event in self.history:
+      queue.put_nowait(event() if callable(event) else event)
+    if self.finished:
+      queue.put_nowait(None)
+    self.subscribers.add(queue)
+    return queue
+
+  def detach(self, queue: asyncio.Queue) -> None:
+    self.subscribers.discard(queue)
+    if not self.subscribers and self.task is not None:
+      # Nobody is listening any more
+      self.task.cancel()
+
+
+_flights: dict[str, _Flight] = {}
+_coalesced = 0
+
+
+def _flight_key(pdf: bytes, prompt: str) -> str:
+  digest = hashlib.sha256(pdf)
+  digest.update(b"\0" + " ".join(prompt.split()).lower().encode())
+  return digest.hexdigest()
+
+
+def _agent_event(node: str, state: dict, previous: dict | None = None) -> dict:
+  data = {"node": node, "status": "completed", "data": _client_state(state, previous)}
+  return {"event": "agent", "data": json.dumps(data)}
+
+
+async def _run_flight(flight: _Flight, graph, initial_state: dict) -> None:
+  # Node completions and side-channel events (e.g. executor metrics) share one queue
+  job_id = flight.job_id
+  queue: asyncio.Queue = asyncio.Queue()
+  events.subscribe(job_id, queue)
+  budget.start(job_id)
+
+  async def run_graph():
+    # Provider calls made by the graph's nodes are queued fairly per job
+    with job_scope(job_id):
+      try:
+        async for event in graph.astream(initial_state):
+          await queue.put(("node", event))
+      finally:
+        await queue.put(("end", None))
+
+  task = asyncio.create_task(run_graph())
+  last_state = initial_state
+  try:
+    while True:
+      kind, payload = await queue.get()
+      if kind == "end":
+        break
+      if kind != "node":
+        flight.emit({"event": kind, "data": json.dumps(payload)})
+        continue
+      # event is a dict with a single key: the node name that just completed
+      for node_name, node_state in payload.items():
+        previous, last_state = last_state, {**last_state, **node_state}
+        replay = partial(_agent_event, node_name, node_state, previous)
+        flight.emit(replay(), replay)
+      flight.emit({"event": "budget", "data": json.dumps(budget.usage(job_id))})
+    await task
+    replay = partial(_agent_event, "done", last_state)
+    flight.emit(replay(), replay)
+  except Exception as exc:
+    print(f"[Main] Job {job_id} failed: {exc!r}")
+    # Tell every attached client instead of just ending their streams
+    flight.emit({"event": "error", "data": json.dumps({"job_id": job_id, "error": repr(exc)})})
+  finally:
+    events.unsubscribe(job_id, queue)
+    task.cancel()
+    artifacts.discard_job(job_id)
+    spent = budget.finish(job_id)
+    print(
+      f"[Main] Job {job_id} used {spent['tokens']} tokens, ${spent['cost_usd']}, "
+      f"{spent['wall_s']}s ({spent['level']})"
+    )
+    if _flights.get(flight.key) is flight:
+      del _flights[flight.key]
+    flight.emit(None)
 
 
 @app.post("/generate")
 async def generate_stream(
   file: UploadFile = File(...), prompt: str = Form(...), password: str = Form(...)
 ):
+  global _coalesced
   if password != "Dhruv":
     raise HTTPException(status_code=401, detail="Unauthorized")
 
-  pdf_path = PDF_DIR / f"{uuid.uuid4()}.pdf"
-  pdf_path.write_bytes(await file.read())
-
-  initial_state = {
-    "pdf_path": str(pdf_path),
-    "user_instructions": prompt,
-    "parsed_sections": {},
-    "implementation_plan": {},
-    "generated_code": "",
-    "review_feedback": {},
-    "revision_count": 0,
-    "status": "initialized",
-    "execution_output": "",
-    "execution_error": "",
-    "execution_success": False,
-    "error_history": [],
-    "debug_action": "",
-    "review_iteration": 0,
-    "output_repo_path": "",
-    "observed_metrics": {},
-    "report_markdown": "",
-    "github_repo_name": "",
-    "github_repo_url": "",
-    "github_publish_error": "",
-    "published": False,
-    "run_result": {},
-  }
+  graph = await app.state.graph_task
+
+  pdf = await file.read()
+  key = _flight_key(pdf, prompt)
+  flight = _flights.get(key)
+  attached = flight is not None
+  if attached:
+    # Same paper and instructions already running: share its stream
+    _coalesced += 1
+    print(f"[Main] Coalescing request into in-flight job {flight.job_id}")
+  else:
+    job_id = str(uuid.uuid4())
+    pdf_path = PDF_DIR / f"{job_id}.pdf"
+    pdf_path.write_bytes(pdf)
+    flight = _flights[key] = _Flight(key, job_id)
+    flight.task = asyncio.create_task(_run_flight(flight, graph, new_state(str(pdf_path), prompt)))
 
   async def event_generator():
-    last_state = initial_state
-    async for event in graph.astream(initial_state):
-      # event is a dict with a single key: the node name that just completed
-      for node_name, node_state in event.items():
-        last_state = {**last_state, **node_state}
+    queue = flight.attach()
+    try:
+      if attached:
         yield {
-          "event": "agent",
-          "data": json.dumps(
-            {
-              "node": node_name,
-              "status": "completed",
-              "data": _serialize_state(node_state),
-            }
-          ),
-        }
-    yield {
-      "event": "agent",
-      "data": json.dumps(
-        {
-          "node": "done",
-          "status": "completed",
-          "data": _serialize_state(last_state),
+          "event": "attached",
+          "data": json.dumps({"job_id": flight.job_id, "replayed": len(flight.history)}),
         }
-      ),
-    }
+      while True:
+        event = await queue.get()
+        if event is None:
+          break
+        yield event
+    finally:
+      flight.detach(queue)
 
   return EventSourceResponse(event_generator())
 
 
+# Fields the UI renders; their artifact handles are resolved before sending
+_HYDRATED_FIELDS = (
+  "generated_code",
+  "generated_files",
+  "execution_output",
+  "execution_error",
+  "report_markdown",
+)
+# Internal bookkeeping made of artifact handles; never sent to the client
+_SERVER_ONLY_FIELDS = ("best_passing", "reviewed_files")
+
+
+def _client_state(state: dict, previous: dict | None = None) -> dict:
+  """State for the SSE client, with UI fields loaded from the artifact store.
+
+  With *previous*, UI fields whose handle hasn't changed are left out, so each event
+  only carries the code and logs the node actually produced.
+  """
+  out = {}
+  for k, v in state.items():
+    if k in _SERVER_ONLY_FIELDS:
+      continue
+    if k in _HYDRATED_FIELDS:
+      if previous is not None and previous.get(k) == v:
+        continue
+      v = artifacts.get_files(v) if isinstance(v, dict) else artifacts.get(v)
+    out[k] = v
+  return _serialize_state(out)
+
+
 def _serialize_state(state: dict) -> dict:
   """Make state JSON-serializable by converting non-serializable values."""
   out = {}
@@ -10,6 +10,12 @@ If a field is not found, set it to null."""
 PLANNER_PROMPT = """You are a software architect specializing in ML research implementation.
 Given a parsed research paper, produce a concrete implementation plan for a reproducible mini-repo."""
 
+# Appended to PLANNER_PROMPT in multi-file mode (CODER_MULTI_FILE=1)
+PLANNER_MODULES_PROMPT = """
+Split the implementation into small src/ modules (problem definition, algorithm, metrics) and give
+each one an exact interface stub, so the modules can be written independently and still fit together.
+method.py only composes them and exposes run_experiment(config_path: str) -> dict."""
+
 CODER_PROMPT = """You are an expert ML engineer implementing research papers in Python.
 Given an implementation plan and the original paper context, write the content of method.py only.
 Brevity of code is paramount for ensuring the entire code fits within token limits and is easy to debug.
@@ -20,10 +26,31 @@ Rules:
 - Keep it simple and readable — correctness over cleverness
 - Expose run_experiment(config_path: str) -> dict that returns a JSON-serializable metrics dictionary
 - Provide a minimal fallback path so run_experiment still works without external datasets
+- Log per-iteration series (loss, residual, consensus error, ...) with `from src.metrics import log_metric`
+  and `log_metric(name, value, step)`; return only final values from run_experiment, never print metrics
 - IMPORTANT: read config values defensively via config.get("key", default), never rely on config["key"] for required parameters
 - IMPORTANT: run_experiment must work with a minimal config containing keys like seed, n_agents, dim, max_iter/max_iterations, step_size/step_alpha/step_beta
 Return ONLY the raw Python code, no markdown fences, no explanation."""
 
+MODULE_CODER_PROMPT = """You are an expert ML engineer implementing one module of a research paper reproduction in Python.
+All modules are written in parallel from the same plan, so the interfaces you are given are a contract:
+implement the assigned module's interface exactly, and import other modules only through their interfaces
+(e.g. `from src.algorithm import ...`).
+Rules:
+- Output only raw Python code for the assigned file
+- Add comments citing the relevant paper section for key blocks
+- Keep it short, simple and readable — correctness over cleverness
+- If the assigned file is method.py, expose run_experiment(config_path: str) -> dict returning a
+  JSON-serializable metrics dictionary, read config values defensively via config.get("key", default),
+  and work without external datasets
+- Log per-iteration series (loss, residual, consensus error, ...) with `from src.metrics import log_metric`
+  and `log_metric(name, value, step)` instead of printing them
+Return ONLY the raw Python code, no markdown fences, no explanation."""
+
+CONTINUATION_PROMPT = """Your previous reply was cut off by the output length limit.
+Continue exactly where it stopped, mid-line if necessary. Do not repeat anything you already wrote,
+do not restart the file and do not open a new code block; just write the rest of the file."""
+
 DEBUGGER_PROMPT = """You are an expert Python debugger. A script has failed with an error.
 
 Analyze the root cause carefully, then decide on an action:
@@ -33,5 +60,24 @@ Analyze the root cause carefully, then decide on an action:
 If patching, provide the complete corrected Python code.
 If recoding, provide clear guidance for the coder on what to design differently."""
 
+OPTIMIZER_PROMPT = """You are a performance engineer for numerical Python research code.
+You are given one file of a working implementation and the loop-heavy functions that dominate its run time.
+Rewrite those functions with vectorized or batched numpy operations (broadcasting, matrix products,
+np.einsum, cumulative ops) instead of element-wise Python loops. Rules:
+- Results must stay numerically the same: keep the algorithm, iteration counts, convergence checks
+  and the order of random number draws
+- Keep every function and class signature, module-level name and import the rest of the repo uses
+- Keep outer iteration loops whose steps depend on each other; vectorize the work inside them
+- Keep log_metric calls and their steps unchanged
+Return ONLY the complete raw Python code of the file, no markdown fences, no explanation."""
+
 REVIEWER_PROMPT = """You are a research paper implementation reviewer.
 Given the original paper methodology, generated code, and observed metrics/output, provide a brief review."""
+
+INCREMENTAL_REVIEWER_PROMPT = """You are a research paper implementation reviewer re-checking a revision.
+You are given your previous review of the implementation, the diff of the code since then, and the
+new execution output and metrics. Do not re-review unchanged code. Decide only:
+- which items from the previous `missing` list the diff resolves
+- whether the diff introduced regressions (removed features, broken logic, worse metrics)
+Return the updated review: `missing` lists the unresolved items plus any regressions, `summary`
+describes the implementation as it stands now, and `verdict` is "complete" only if nothing is missing."""
@@ -13,6 +13,14 @@ class DebuggerOutput(BaseModel):
   )
 
 
+class ModuleSpec(BaseModel):
+  path: str = Field(description="Module path inside the repo, e.g. src/algorithm.py")
+  purpose: str = Field(description="One sentence on what the module is responsible for")
+  interface: str = Field(
+    description="Python stub of the public API: imports, class/function signatures with type hints and one-line docstrings, bodies as '...'"
+  )
+
+
 class PlannerOutput(BaseModel):
   overview: str = Field(description="One paragraph summary of what will be implemented")
   files: list[str] = Field(
@@ -22,6 +30,10 @@ class PlannerOutput(BaseModel):
   functions: list[str] = Field(description="List of functions needed with brief descriptions")
   libraries: list[str] = Field(description="List of pip-installable libraries required")
   implementation_notes: str = Field(description="Important details or caveats")
+  modules: list[ModuleSpec] = Field(
+    default_factory=list,
+    description="Interfaces for the src/ modules (typically src/problem.py, src/algorithm.py, src/metrics.py) that method.py composes",
+  )
 
 
 class ReviewerOutput(BaseModel):
@@ -5,9 +5,15 @@ class AgentState(TypedDict):
   pdf_path: str
   user_instructions: str
   parsed_sections: dict
+  paper_index_path: str
   implementation_plan: dict
   generated_code: str
+  generated_files: dict
+  library_refs: list
+  config_overrides: dict
+  extra_packages: list
   review_feedback: dict
+  reviewed_files: dict
   revision_count: int
   status: str
 
@@ -25,3 +31,39 @@ class AgentState(TypedDict):
   github_publish_error: str
   published: bool
   run_result: dict
+  best_passing: dict
+
+
+def new_state(pdf_path: str, user_instructions: str) -> AgentState:
+  """Initial graph state for one paper."""
+  return {
+    "pdf_path": pdf_path,
+    "user_instructions": user_instructions,
+    "parsed_sections": {},
+    "paper_index_path": "",
+    "implementation_plan": {},
+    "generated_code": "",
+    "generated_files": {},
+    "library_refs": [],
+    "config_overrides": {},
+    "extra_packages": [],
+    "review_feedback": {},
+    "reviewed_files": {},
+    "revision_count": 0,
+    "status": "initialized",
+    "execution_output": "",
+    "execution_error": "",
+    "execution_success": False,
+    "error_history": [],
+    "debug_action": "",
+    "review_iteration": 0,
+    "output_repo_path": "",
+    "observed_metrics": {},
+    "report_markdown": "",
+    "github_repo_name": "",
+    "github_repo_url": "",
+    "github_publish_error": "",
+    "published": False,
+    "run_result": {},
+    "best_passing": {},
+  }
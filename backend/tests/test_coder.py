@@ -0,0 +1,31 @@
+from agents.coder import _ends_early, _stitch
+
+
+def test_unclosed_bracket_spanning_lines_is_truncation():
+  assert _ends_early("def f():\n  x = [1,\n   2,\n   3,")
+  assert _ends_early("result = solve(\n  a,\n  b,")
+
+
+def test_unterminated_string_is_truncation():
+  assert _ends_early('def f():\n  """Docstring\n  still going')
+  assert _ends_early('x = "abc')
+
+
+def test_block_cut_after_header_is_truncation():
+  assert _ends_early("def f():\n  for i in range(3):\n")
+
+
+def test_open_fence_is_truncation():
+  assert _ends_early("```python\nx = 1\n")
+
+
+def test_complete_or_broken_code_is_not_truncation():
+  assert not _ends_early("def f():\n  return [1, 2, 3]\n")
+  # A mistake mid-file is a bug for the debugger, not a cut-off reply
+  assert not _ends_early("def f(:\n  pass\nx = 1\n")
+
+
+def test_stitch_drops_reopened_fence_and_repeated_tail():
+  partial = "```python\ndef f():\n  return [1,\n"
+  continuation = "```python\n  return [1,\n  2]\n```"
+  assert _stitch(partial, continuation) == "```python\ndef f():\n  return [1,\n  2]\n```"
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents import structured
+from schemas import DebuggerOutput, ReviewerOutput
+
+
+class FakeLLM:
+  """Returns *raw* from the structured call and *reask* from the plain re-ask."""
+
+  def __init__(self, route: str, calls: list, raw: str, reask: str):
+    self.route, self.calls, self.raw, self.reask = route, calls, raw, reask
+
+  def with_structured_output(self, schema, include_raw=False):
+    def invoke(messages):
+      self.calls.append(("structured", self.route))
+      return {"raw": AIMessage(content=self.raw), "parsed": None, "parsing_error": "bad"}
+
+    return SimpleNamespace(invoke=invoke)
+
+  def invoke(self, messages):
+    self.calls.append(("reask", self.route))
+    return AIMessage(content=self.reask)
+
+
+def _fake_routes(monkeypatch, raw: str, reask: str) -> list:
+  calls = []
+  monkeypatch.setattr(structured, "get_llm", lambda route: FakeLLM(route, calls, raw, reask))
+  return calls
+
+
+def test_truncated_patch_is_reasked_on_the_callers_route(monkeypatch):
+  cut_off = '{"analysis": "off by one", "action": "patch", "output": "def f():\\n  return ['
+  patched = "def f():\n  return [1, 2]\n"
+  calls = _fake_routes(monkeypatch, cut_off, '{"output": "def f():\\n  return [1, 2]\\n"}')
+
+  result = structured.invoke_structured("debugger", DebuggerOutput, [HumanMessage(content="x")])
+
+  assert calls == [("structured", "debugger"), ("reask", "debugger")]
+  assert result.action == "patch"
+  assert result.output == patched
+
+
+def test_missing_scalar_is_reasked_on_the_fast_route(monkeypatch):
+  calls = _fake_routes(
+    monkeypatch, '{"analysis": "a", "output": "guidance"}', '{"action": "recode"}'
+  )
+
+  result = structured.invoke_structured("debugger", DebuggerOutput, [HumanMessage(content="x")])
+
+  assert calls[-1] == ("reask", structured.STRUCTURED_REASK_ROUTE)
+  assert result.action == "recode"
+
+
+def test_close_truncated_drops_the_cut_off_string():
+  assert structured.extract_json('{"action": "patch", "output": "def f(') == {"action": "patch"}
+
+
+def test_reask_route_by_field_kind():
+  assert structured._reask_route("reviewer", ReviewerOutput, ["verdict"]) == "fast"
+  assert structured._reask_route("reviewer", ReviewerOutput, ["verdict", "missing"]) == "reviewer"
+  assert structured._reask_route("debugger", DebuggerOutput, ["output"]) == "debugger"
@@ -0,0 +1,158 @@
+"""Executor worker: runs generated repos for API processes through the SQLite broker.
+
+Start as many as the hardware allows, on the same host as the API and the broker database.
+The broker uses SQLite in WAL mode, so the database must be on a local disk; workers on
+other machines or on a network filesystem are not supported:
+
+  EXECUTOR_BROKER=/var/lib/descartes/broker.db python worker.py --slots 4
+
+Each slot claims one task at a time, installs the task's packages, runs the tests and
+the experiment in a scratch directory and returns the outcome together with every file
+the run created or changed (metrics, series, plots, logs).
+"""
+
+import argparse
+import base64
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from agents import broker
+from agents.executor import EXECUTOR_BROKER, run_repo
+
+_IDLE_SLEEP = 0.5
+# Produced files larger than this are left out of the result
+_MAX_ARTIFACT_BYTES = int(float(os.environ.get("WORKER_MAX_ARTIFACT_MB", "20")) * 2**20)
+
+
+def _artifacts(repo_dir: Path, files: dict[str, str]) -> dict[str, str]:
+  """Files the run created or modified, base64-encoded by repo-relative path."""
+  out = {}
+  total = 0
+  for path in sorted(repo_dir.rglob("*")):
+    if not path.is_file() or "__pycache__" in path.parts:
+      continue
+    rel = path.relative_to(repo_dir).as_posix()
+    size = path.stat().st_size
+    sent = files[rel].encode() if rel in files else None
+    if sent is not None and len(sent) == size and sent == path.read_bytes():
+      continue
+    if total + size > _MAX_ARTIFACT_BYTES:
+      # Checked before reading: spilled output logs can be hundreds of MB
+      print(f"[Worker] Skipping artifact {rel} ({size} bytes) — size budget exhausted")
+      continue
+    data = path.read_bytes()
+    out[rel] = base64.b64encode(data).decode()
+    total += len(data)
+  return out
+
+
+class _Heartbeat:
+  """Keeps the claimed task alive; flags loss if the broker handed it to another worker."""
+
+  def __init__(self, db_path: str, task_id: str, worker: str):
+    self.db_path = db_path
+    self.task_id = task_id
+    self.worker = worker
+    self.lost = False
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._loop, daemon=True)
+
+  def __enter__(self):
+    self._thread.start()
+    return self
+
+  def __exit__(self, *exc):
+    self._stop.set()
+    self._thread.join()
+
+  def _loop(self) -> None:
+    while not self._stop.wait(broker.HEARTBEAT_INTERVAL):
+      if not broker.heartbeat(self.db_path, self.task_id, self.worker):
+        self.lost = True
+        return
+
+
+def _execute(db_path: str, task_id: str, payload: dict, worker: str) -> None:
+  repo_dir = Path(tempfile.mkdtemp(prefix="descartes_task_"))
+  files = payload["files"]
+
+  def publish(event: str, data: dict) -> None:
+    broker.add_event(db_path, task_id, event, data)
+
+  started = time.monotonic()
+  try:
+    with _Heartbeat(db_path, task_id, worker) as beat:
+      outcome = run_repo(
+        repo_dir,
+        files,
+        set(payload["imports"]),
+        set(payload["preload"]),
+        publish,
+        profile=payload.get("profile", False),
+        sweep=payload.get("sweep", False),
+      )
+      if not outcome["install_error"]:
+        outcome["artifacts"] = _artifacts(repo_dir, files)
+    if beat.lost:
+      print(f"[Worker] {worker} lost task {task_id} to another worker — dropping result")
+    elif broker.complete(db_path, task_id, worker, outcome):
+      print(f"[Worker] {worker} finished task {task_id} in {time.monotonic() - started:.1f}s")
+  except Exception as exc:
+    print(f"[Worker] {worker} failed task {task_id}: {exc!r}")
+    broker.fail(db_path, task_id, worker, repr(exc))
+  finally:
+    shutil.rmtree(repo_dir, ignore_errors=True)
+
+
+def _slot_loop(db_path: str, slot: int, stop: threading.Event) -> None:
+  worker = broker.worker_id(slot)
+  broker.register_worker(db_path, worker, slots=1)
+  last_beat = 0.0
+  while not stop.is_set():
+    now = time.monotonic()
+    if now - last_beat >= broker.HEARTBEAT_INTERVAL:
+      broker.heartbeat(db_path, None, worker)
+      broker.requeue_stale(db_path)
+      last_beat = now
+    claimed = broker.claim(db_path, worker)
+    if claimed is None:
+      stop.wait(_IDLE_SLEEP)
+      continue
+    task_id, payload = claimed
+    print(f"[Worker] {worker} claimed task {task_id}")
+    _execute(db_path, task_id, payload, worker)
+    last_beat = 0.0
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description="Descartes executor worker")
+  parser.add_argument("--broker", default=EXECUTOR_BROKER, help="Broker database path")
+  parser.add_argument(
+    "--slots", type=int, default=os.cpu_count() or 1, help="Tasks run concurrently"
+  )
+  args = parser.parse_args()
+  if not args.broker:
+    parser.error("set EXECUTOR_BROKER or pass --broker")
+
+  stop = threading.Event()
+  threads = [
+    threading.Thread(target=_slot_loop, args=(args.broker, slot, stop), daemon=True)
+    for slot in range(args.slots)
+  ]
+  for thread in threads:
+    thread.start()
+  print(f"[Worker] {args.slots} slot(s) serving {args.broker}")
+  try:
+    while any(thread.is_alive() for thread in threads):
+      time.sleep(1)
+  except KeyboardInterrupt:
+    stop.set()
+  return 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
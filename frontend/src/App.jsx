@@ -223,6 +223,11 @@ function App() {
         for (const line of lines) {
           if (line.startsWith('event:')) {
             eventType = line.slice(6).trim()
+          } else if (line.startsWith('data:') && eventType === 'error') {
+            const data = JSON.parse(line.slice(5).trim())
+            setError(data.error || 'Pipeline failed')
+            setActiveNode(null)
+            eventType = null
           } else if (line.startsWith('data:') && eventType === 'agent') {
             const data = JSON.parse(line.slice(5).trim())
             if (data.node === 'done') {